@@ -0,0 +1,3 @@
+#!/bin/bash
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import text
+
+from common.asyncSessionLocal import async_engine
+from common.sessionLocal import engine
+
+LOOKUPS = [
+	'SELECT * FROM "chat_rooms" WHERE "id" = :room_id',
+	'SELECT * FROM "chat_members" WHERE "room_id" = :room_id',
+	'SELECT * FROM "messages" WHERE "room_id" = :room_id ORDER BY "created_at" DESC, "id" DESC LIMIT 50',
+]
+
+
+def _room_ids(sample: int) -> list:
+	with engine.connect() as conn:
+		return [
+			row[0]
+			for row in conn.execute(
+				text('SELECT "id" FROM "chat_rooms" ORDER BY random() LIMIT :sample'),
+				{"sample": sample},
+			)
+		]
+
+
+def _run_sync(room_ids: list) -> float:
+	started = time.perf_counter()
+	with engine.connect() as conn:
+		for room_id in room_ids:
+			for query in LOOKUPS:
+				conn.execute(text(query), {"room_id": room_id}).fetchall()
+	return time.perf_counter() - started
+
+
+async def _lookup(query: str, room_id: int) -> None:
+	async with async_engine.connect() as conn:
+		result = await conn.execute(text(query), {"room_id": room_id})
+		result.fetchall()
+
+
+async def _request(room_id: int, limiter: asyncio.Semaphore) -> None:
+	async with limiter:
+		await asyncio.gather(*(_lookup(query, room_id) for query in LOOKUPS))
+
+
+async def _run_async(room_ids: list, concurrency: int) -> float:
+	limiter = asyncio.Semaphore(concurrency)
+	async with async_engine.connect() as conn:
+		await conn.execute(text("SELECT 1"))
+	started = time.perf_counter()
+	await asyncio.gather(*(_request(room_id, limiter) for room_id in room_ids))
+	elapsed = time.perf_counter() - started
+	await async_engine.dispose()
+	return elapsed
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--requests", type=int, default=1000)
+	parser.add_argument("--concurrency", type=int, default=10, help="requests in flight for the async run")
+	args = parser.parse_args()
+
+	room_ids = _room_ids(max(1, args.requests // 10))
+	if not room_ids:
+		print("no records found: chat_rooms")
+		return 1
+	workload = [random.choice(room_ids) for _ in range(args.requests)]
+
+	sync_elapsed = _run_sync(workload)
+	async_elapsed = asyncio.run(_run_async(workload, args.concurrency))
+	queries = len(workload) * len(LOOKUPS)
+	print("mode\trequests\tqueries\telapsed_s\trequests_per_s\tqueries_per_s")
+	for mode, elapsed in (("sync", sync_elapsed), ("async", async_elapsed)):
+		print(
+			f"{mode}\t{len(workload)}\t{queries}\t{elapsed:.3f}\t"
+			f"{len(workload) / elapsed:.1f}\t{queries / elapsed:.1f}"
+		)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
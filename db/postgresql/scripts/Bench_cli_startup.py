@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+COMMANDS = {
+	"cli_help": ["Db_cli.py", "--help"],
+	"cli_tables": ["Db_cli.py", "tables"],
+	"cli_ls_limit": ["Db_cli.py", "ls", "users", "--limit", "1"],
+	"legacy_table_ls": ["Table_ls.py"],
+}
+
+
+def _git_commit() -> str:
+	try:
+		return subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"],
+			cwd=SCRIPT_DIR,
+			capture_output=True,
+			text=True,
+			check=True,
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return ""
+
+
+def _measure(command: list, repeat: int) -> list:
+	samples = []
+	for _ in range(repeat):
+		started = time.perf_counter()
+		subprocess.run(
+			[sys.executable, *command],
+			cwd=SCRIPT_DIR,
+			stdout=subprocess.DEVNULL,
+			stderr=subprocess.DEVNULL,
+			check=False,
+		)
+		samples.append((time.perf_counter() - started) * 1000)
+	return samples
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--repeat", type=int, default=10)
+	parser.add_argument("--output", default="cli_startup.jsonl", help="JSONL file results are appended to")
+	parser.add_argument("commands", nargs="*", default=list(COMMANDS), help="names of commands to time")
+	args = parser.parse_args()
+
+	commit = _git_commit()
+	measured_at = datetime.utcnow().isoformat(timespec="seconds")
+	print("command\tmedian_ms\tmin_ms\tmax_ms")
+	with open(args.output, "a", encoding="utf-8") as f:
+		for name in args.commands:
+			if name not in COMMANDS:
+				print(f"unknown command: {name}")
+				return 1
+			samples = _measure(COMMANDS[name], args.repeat)
+			result = {
+				"measured_at": measured_at,
+				"commit": commit,
+				"command": name,
+				"repeat": args.repeat,
+				"median_ms": round(statistics.median(samples), 3),
+				"min_ms": round(min(samples), 3),
+				"max_ms": round(max(samples), 3),
+			}
+			f.write(json.dumps(result) + "\n")
+			print(f"{name}\t{result['median_ms']}\t{result['min_ms']}\t{result['max_ms']}")
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from common.sessionLocal import engine
+from Member_inbox import fetch_inbox
+
+
+def _percentile(samples: list, pct: float) -> float:
+	ordered = sorted(samples)
+	return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _users_by_room_count(conn) -> dict:
+	rows = conn.execute(
+		text(
+			'SELECT "user_id", count(*) AS "rooms" FROM "chat_members" '
+			'GROUP BY "user_id" ORDER BY "rooms"'
+		)
+	).fetchall()
+	if not rows:
+		return {}
+	return {
+		"fewest_rooms": rows[0],
+		"median_rooms": rows[len(rows) // 2],
+		"most_rooms": rows[-1],
+	}
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--iterations", type=int, default=100)
+	parser.add_argument("--limit", type=int, default=50, help="page size (0 for the whole inbox)")
+	parser.add_argument("--pointer", action="store_true", help="also time the materialized pointer")
+	args = parser.parse_args()
+
+	limit = args.limit or None
+	modes = {"lateral": False, "pointer": True} if args.pointer else {"lateral": False}
+	with engine.connect() as conn:
+		users = _users_by_room_count(conn)
+		if not users:
+			print("no records found: chat_members")
+			return 1
+		print("user\trooms\tmode\tp50_ms\tp95_ms\tmean_ms")
+		for label, (user_id, rooms) in users.items():
+			for mode, use_pointer in modes.items():
+				samples = []
+				for _ in range(args.iterations):
+					started = time.perf_counter()
+					fetch_inbox(user_id, limit, use_pointer=use_pointer, conn=conn)
+					samples.append((time.perf_counter() - started) * 1000)
+				print(
+					f"{label}\t{rooms}\t{mode}\t{statistics.median(samples):.3f}\t"
+					f"{_percentile(samples, 0.95):.3f}\t{statistics.mean(samples):.3f}"
+				)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
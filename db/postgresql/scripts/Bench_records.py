@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import text
+
+from common.get_schema import invalidate_schema
+from common.sessionLocal import engine
+from Record_delete import deleteRecord
+from Record_insert import insertRecord
+from Record_ls import lsRecord
+from Record_select import selectRecord
+from Record_update import updateRecord
+from Table_ls import lsTable
+
+BENCH_TABLE = "bench_records"
+OPERATIONS = ("lsTable", "lsRecord", "selectRecord", "updateRecord", "insertRecord", "deleteRecord")
+MEMORY_OPS = 100
+
+
+def _git_commit() -> str:
+	try:
+		return subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"],
+			cwd=os.path.dirname(os.path.abspath(__file__)),
+			capture_output=True,
+			text=True,
+			check=True,
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return ""
+
+
+def _percentile(samples: list, pct: float) -> float:
+	ordered = sorted(samples)
+	return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _prepare(size: int) -> None:
+	with engine.begin() as conn:
+		conn.execute(text(f'DROP TABLE IF EXISTS "{BENCH_TABLE}"'))
+		conn.execute(
+			text(
+				f'CREATE TABLE "{BENCH_TABLE}" ('
+				'"id" serial PRIMARY KEY, "name" varchar(255) NOT NULL, "value" integer NOT NULL, '
+				'"flag" boolean NOT NULL, "created_at" timestamp NOT NULL)'
+			)
+		)
+		conn.execute(
+			text(
+				f'INSERT INTO "{BENCH_TABLE}" ("name", "value", "flag", "created_at") '
+				"SELECT 'row ' || g, g % 1000, g % 2 = 0, timestamp '2024-01-01' + g * interval '1 second' "
+				"FROM generate_series(1, :size) AS g"
+			),
+			{"size": size},
+		)
+		conn.execute(text(f'ANALYZE "{BENCH_TABLE}"'))
+	invalidate_schema(engine)
+
+
+def _operation(name: str, size: int, delete_ids):
+	if name == "lsTable":
+		return lambda: lsTable(engine)
+	if name == "lsRecord":
+		return lambda: lsRecord(BENCH_TABLE, 100, random.randint(0, max(0, size - 100)))
+	if name == "selectRecord":
+		return lambda: selectRecord(BENCH_TABLE, "id", random.randint(1, size))
+	if name == "updateRecord":
+		return lambda: updateRecord(BENCH_TABLE, {"id": random.randint(1, size)}, {"value": random.randint(0, 999)})
+	if name == "insertRecord":
+		return lambda: insertRecord(
+			BENCH_TABLE,
+			{"name": "bench insert", "value": 0, "flag": False, "created_at": datetime.utcnow()},
+		)
+	return lambda: deleteRecord(BENCH_TABLE, {"id": next(delete_ids)})
+
+
+def _run(operation, ops: int, concurrency: int):
+	samples = []
+	lock = threading.Lock()
+	remaining = itertools.count()
+
+	def worker() -> None:
+		local = []
+		while next(remaining) < ops:
+			started = time.perf_counter()
+			try:
+				operation()
+			except StopIteration:
+				break
+			local.append((time.perf_counter() - started) * 1000)
+		with lock:
+			samples.extend(local)
+
+	started = time.perf_counter()
+	with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+		with ThreadPoolExecutor(max_workers=concurrency) as executor:
+			futures = [executor.submit(worker) for _ in range(concurrency)]
+			for future in futures:
+				future.result()
+	return samples, time.perf_counter() - started
+
+
+def _delete_ids(size: int):
+	with engine.connect() as conn:
+		ids = [row[0] for row in conn.execute(text(f'SELECT "id" FROM "{BENCH_TABLE}" WHERE "id" > :size'), {"size": size})]
+	return iter(ids)
+
+
+def _probe_memory(name: str, size: int, ops: int) -> int:
+	delete_ids = None
+	if name == "deleteRecord":
+		# the timed run already deleted the rows insertRecord added, so the probe brings its own
+		with engine.begin() as conn:
+			conn.execute(
+				text(
+					f'INSERT INTO "{BENCH_TABLE}" ("name", "value", "flag", "created_at") '
+					"SELECT 'bench insert', 0, false, now() FROM generate_series(1, :ops)"
+				),
+				{"ops": ops},
+			)
+		delete_ids = _delete_ids(size)
+	operation = _operation(name, size, delete_ids)
+	with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+		# one warm-up call loads the pool and the schema cache, so the baseline covers fixed costs
+		operation()
+		before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		for _ in range(ops - 1):
+			try:
+				operation()
+			except StopIteration:
+				break
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+
+
+def _peak_rss_kb(name: str, size: int, ops: int):
+	# ru_maxrss only ever grows and tracemalloc misses libpq's result buffers, so each operation
+	# is measured in a fresh child process as its peak RSS growth over the warmed-up baseline
+	completed = subprocess.run(
+		[sys.executable, os.path.abspath(__file__), "--memory-probe", name, "--probe-size", str(size), "--ops", str(ops)],
+		capture_output=True,
+		text=True,
+	)
+	if completed.returncode != 0:
+		print(f"memory probe failed: {name}: {completed.stderr.strip()}", file=sys.stderr)
+		return None
+	return int(completed.stdout.split()[-1])
+
+
+def runBenchmarks(sizes: list, concurrencies: list, ops: int, operations=OPERATIONS) -> list:
+	results = []
+	for size in sizes:
+		_prepare(size)
+		for concurrency in concurrencies:
+			delete_ids = None
+			for name in operations:
+				if name == "deleteRecord":
+					delete_ids = _delete_ids(size)
+				operation = _operation(name, size, delete_ids)
+				samples, elapsed = _run(operation, ops, concurrency)
+				if not samples:
+					continue
+				peak_rss_kb = _peak_rss_kb(name, size, min(ops, MEMORY_OPS))
+				result = {
+					"operation": name,
+					"size": size,
+					"concurrency": concurrency,
+					"ops": len(samples),
+					"elapsed_s": round(elapsed, 3),
+					"throughput": round(len(samples) / elapsed, 1),
+					"p50_ms": round(_percentile(samples, 0.50), 3),
+					"p95_ms": round(_percentile(samples, 0.95), 3),
+					"p99_ms": round(_percentile(samples, 0.99), 3),
+					"peak_rss_kb": peak_rss_kb,
+				}
+				results.append(result)
+				print(
+					f"{name}\t{size}\t{concurrency}\t{result['throughput']}\t"
+					f"{result['p50_ms']}\t{result['p95_ms']}\t{result['p99_ms']}\t{'' if peak_rss_kb is None else peak_rss_kb}"
+				)
+	with engine.begin() as conn:
+		conn.execute(text(f'DROP TABLE IF EXISTS "{BENCH_TABLE}"'))
+	invalidate_schema(engine)
+	return results
+
+
+def _compare(baseline_path: str, results: list) -> None:
+	with open(baseline_path, encoding="utf-8") as f:
+		baseline = json.load(f)
+	previous = {
+		(item["operation"], item["size"], item["concurrency"]): item for item in baseline["results"]
+	}
+	print(f"compared with: {baseline.get('commit', '')}")
+	print("operation\tsize\tconcurrency\tthroughput_ratio\tp95_ratio")
+	for item in results:
+		old = previous.get((item["operation"], item["size"], item["concurrency"]))
+		if old is None or not old["throughput"] or not old["p95_ms"]:
+			continue
+		print(
+			f"{item['operation']}\t{item['size']}\t{item['concurrency']}\t"
+			f"{item['throughput'] / old['throughput']:.2f}\t{item['p95_ms'] / old['p95_ms']:.2f}"
+		)
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--sizes", default="1000,100000,10000000", help="comma-separated table sizes")
+	parser.add_argument("--concurrency", default="1,4,16", help="comma-separated thread counts")
+	parser.add_argument("--ops", type=int, default=1000, help="operations per measurement")
+	parser.add_argument("--operations", default=",".join(OPERATIONS))
+	parser.add_argument("--output", help="JSON file for the results (default: bench_records-<commit>.json)")
+	parser.add_argument("--compare", help="earlier results JSON to compare against")
+	parser.add_argument("--memory-probe", help=argparse.SUPPRESS)
+	parser.add_argument("--probe-size", type=int, help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.memory_probe:
+		print(_probe_memory(args.memory_probe, args.probe_size, args.ops))
+		return 0
+
+	operations = args.operations.split(",")
+	for name in operations:
+		if name not in OPERATIONS:
+			print(f"unknown operation: {name}")
+			return 1
+	commit = _git_commit()
+	print("operation\tsize\tconcurrency\tops_per_s\tp50_ms\tp95_ms\tp99_ms\tpeak_rss_kb")
+	results = runBenchmarks(
+		[int(size) for size in args.sizes.split(",")],
+		[int(value) for value in args.concurrency.split(",")],
+		args.ops,
+		operations,
+	)
+	output = args.output or f"bench_records-{commit or 'local'}.json"
+	with open(output, "w", encoding="utf-8") as f:
+		json.dump(
+			{
+				"commit": commit,
+				"measured_at": datetime.utcnow().isoformat(timespec="seconds"),
+				"results": results,
+			},
+			f,
+			indent=2,
+		)
+	print(f"saved: {output}")
+	if args.compare:
+		_compare(args.compare, results)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from common.sessionLocal import engine
+from Message_history import _format_cursor, fetch_room_history
+
+
+def _grow_room(conn, room_id: int, start: int, stop: int) -> None:
+	conn.execute(
+		text(
+			'INSERT INTO "messages" ("room_id", "sender_id", "body", "is_system", "created_at", "updated_at") '
+			"SELECT :room_id, NULL, 'bench message ' || g, false, "
+			"timestamp '2020-01-01' + g * interval '1 second', timestamp '2020-01-01' + g * interval '1 second' "
+			"FROM generate_series(:start, :stop) AS g"
+		),
+		{"room_id": room_id, "start": start, "stop": stop},
+	)
+	conn.execute(text('ANALYZE "messages"'))
+
+
+def _middle_cursor(conn, room_id: int, offset: int) -> str:
+	row = conn.execute(
+		text(
+			'SELECT "created_at", "id" FROM "messages" WHERE "room_id" = :room_id '
+			'ORDER BY "created_at" DESC, "id" DESC OFFSET :offset LIMIT 1'
+		),
+		{"room_id": room_id, "offset": offset},
+	).one()
+	return _format_cursor(row.created_at, row.id)
+
+
+def _timed(conn, room_id: int, before, limit: int, repeat: int) -> list:
+	samples = []
+	for _ in range(repeat):
+		started = time.perf_counter()
+		fetch_room_history(room_id, before, limit, conn=conn)
+		samples.append((time.perf_counter() - started) * 1000)
+	return samples
+
+
+def _percentile(samples: list, pct: float) -> float:
+	ordered = sorted(samples)
+	return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated room sizes")
+	parser.add_argument("--limit", type=int, default=50)
+	parser.add_argument("--repeat", type=int, default=200)
+	args = parser.parse_args()
+	sizes = sorted(int(size) for size in args.sizes.split(","))
+
+	with engine.begin() as conn:
+		room_id = conn.execute(
+			text(
+				'INSERT INTO "chat_rooms" ("name", "is_direct", "created_at", "updated_at") '
+				"VALUES ('bench room history', false, now(), now()) RETURNING id"
+			)
+		).scalar()
+	try:
+		grown = 0
+		print("messages\tpage\tp50_ms\tp95_ms\tmax_ms")
+		for size in sizes:
+			with engine.begin() as conn:
+				_grow_room(conn, room_id, grown + 1, size)
+			grown = size
+			with engine.connect() as conn:
+				cursor = _middle_cursor(conn, room_id, size // 2)
+				for page, before in (("first", None), ("middle", cursor)):
+					samples = _timed(conn, room_id, before, args.limit, args.repeat)
+					print(
+						f"{size}\t{page}\t{statistics.median(samples):.3f}\t"
+						f"{_percentile(samples, 0.95):.3f}\t{max(samples):.3f}"
+					)
+	finally:
+		with engine.begin() as conn:
+			conn.execute(text('DELETE FROM "messages" WHERE "room_id" = :room_id'), {"room_id": room_id})
+			conn.execute(text('DELETE FROM "chat_rooms" WHERE "id" = :room_id'), {"room_id": room_id})
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
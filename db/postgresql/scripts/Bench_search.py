@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+from common.sessionLocal import engine
+from Message_search import search_messages
+from Table_seed import WORDS
+
+
+def _percentile(samples: list, pct: float) -> float:
+	ordered = sorted(samples)
+	return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _busiest_room(conn):
+	return conn.execute(
+		text('SELECT "room_id" FROM "messages" GROUP BY "room_id" ORDER BY count(*) DESC LIMIT 1')
+	).scalar()
+
+
+def _like_search(conn, word: str, limit: int) -> None:
+	conn.execute(
+		text('SELECT "id" FROM "messages" WHERE "body" ILIKE :pattern ORDER BY "id" DESC LIMIT :limit'),
+		{"pattern": f"%{word}%", "limit": limit},
+	).fetchall()
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--queries", type=int, default=200)
+	parser.add_argument("--limit", type=int, default=20)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--like", type=int, default=5, help="ILIKE scans to run for comparison (0 to skip)")
+	args = parser.parse_args()
+
+	rng = random.Random(args.seed)
+	queries = [" ".join(rng.sample(WORDS, rng.randint(1, 2))) for _ in range(args.queries)]
+	with engine.connect() as conn:
+		room_id = _busiest_room(conn)
+		if room_id is None:
+			print("no records found: messages")
+			return 1
+		scenarios = {"all_rooms": None, f"room_{room_id}": room_id}
+		print("scenario\tpage\tqueries\tp50_ms\tp95_ms\tavg_hits")
+		for scenario, scenario_room in scenarios.items():
+			samples = {"first": [], "second": []}
+			hits = []
+			for query in queries:
+				started = time.perf_counter()
+				rows, cursor = search_messages(query, scenario_room, args.limit, conn=conn)
+				samples["first"].append((time.perf_counter() - started) * 1000)
+				hits.append(len(rows))
+				if cursor is not None:
+					started = time.perf_counter()
+					search_messages(query, scenario_room, args.limit, cursor, conn=conn)
+					samples["second"].append((time.perf_counter() - started) * 1000)
+			for page, values in samples.items():
+				if not values:
+					continue
+				print(
+					f"{scenario}\t{page}\t{len(values)}\t{statistics.median(values):.3f}\t"
+					f"{_percentile(values, 0.95):.3f}\t{statistics.mean(hits):.1f}"
+				)
+		like_samples = []
+		for word in rng.sample(WORDS, min(args.like, len(WORDS))):
+			started = time.perf_counter()
+			_like_search(conn, word, args.limit)
+			like_samples.append((time.perf_counter() - started) * 1000)
+		if like_samples:
+			print(
+				f"ilike_scan\tfirst\t{len(like_samples)}\t{statistics.median(like_samples):.3f}\t"
+				f"{_percentile(like_samples, 0.95):.3f}\t"
+			)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+import argparse
+import shlex
+import sys
+from datetime import datetime
+
+
+def _pairs(values) -> dict:
+	pairs = {}
+	for item in values or []:
+		name, sep, value = item.partition("=")
+		if not sep:
+			raise ValueError(f"expected column=value: {item}")
+		pairs[name] = value
+	return pairs
+
+
+def _columns(table_name: str) -> list:
+	from sqlalchemy.exc import NoSuchTableError
+
+	from common.get_schema import get_columns
+	from common.sessionLocal import engine
+
+	try:
+		columns = get_columns(engine, table_name)
+	except NoSuchTableError:
+		columns = []
+	if not columns:
+		raise ValueError(f"table not found: {table_name}")
+	return columns
+
+
+def _column_map(table_name: str) -> dict:
+	return {column["name"]: column["type"] for column in _columns(table_name)}
+
+
+def _cmd_tables(args) -> int:
+	from common.sessionLocal import read_engine
+	from Table_ls import lsTable
+
+	tables = lsTable(read_engine())
+	if not tables:
+		print("tables are nothing")
+	for table in tables:
+		print(table)
+	return 0
+
+
+def _cmd_ls(args) -> int:
+	from Record_ls import lsRecord
+
+	_columns(args.table)
+	lsRecord(args.table, args.limit, args.after)
+	return 0
+
+
+def _cmd_select(args) -> int:
+	from Record_delete import _coerce_row
+	from Record_select import selectRecord
+
+	column_map = _column_map(args.table)
+	where = _coerce_row(_pairs(args.where), column_map)
+	if len(where) > 1:
+		raise ValueError("select supports a single --where column")
+	column_name, value = next(iter(where.items()), (None, None))
+	after = None
+	if args.after is not None:
+		from Record_ls import _single_pk
+		from common.sessionLocal import engine
+
+		pk_column = _single_pk(engine, args.table)
+		if pk_column is None:
+			raise ValueError(f"keyset pagination requires a single-column primary key: {args.table}")
+		after = _coerce_row({pk_column: args.after}, column_map)[pk_column]
+	return selectRecord(args.table, column_name, value, args.limit, after)
+
+
+def _cmd_insert(args) -> int:
+	from Record_insert import _read_records, bulkInsertRecord, insertRecord
+
+	if args.file:
+		bulkInsertRecord(args.table, _read_records(args.file), args.batch_size)
+		return 0
+	from common.get_schema import get_pk_columns
+	from common.sessionLocal import engine
+	from Record_insert import _coerce_record
+
+	column_map = {column["name"]: column for column in _columns(args.table)}
+	pk_columns = set(get_pk_columns(engine, args.table))
+	record = _coerce_record(_pairs(args.set), column_map, pk_columns, datetime.utcnow())
+	if not insertRecord(args.table, record):
+		return 1
+	print(f"inserted: {args.table}")
+	return 0
+
+
+def _cmd_upsert(args) -> int:
+	from Record_insert import _read_records
+	from Record_upsert import upsertRecord
+
+	key = args.key.split(",") if args.key else None
+	upsertRecord(args.table, _read_records(args.file), key, args.batch_size)
+	return 0
+
+
+def _cmd_update(args) -> int:
+	from Record_delete import _coerce_row
+	from Record_insert import _read_records
+	from Record_update import bulkUpdateRecord, updateRecord
+
+	if args.file:
+		_, missing, _ = bulkUpdateRecord(args.table, _read_records(args.file), args.chunk_size)
+		return 1 if missing else 0
+	column_map = _column_map(args.table)
+	pk_values = _coerce_row(_pairs(args.pk), column_map)
+	update_data = _coerce_row(_pairs(args.set), column_map)
+	if not pk_values:
+		raise ValueError("--pk is required")
+	return updateRecord(args.table, pk_values, update_data)
+
+
+def _cmd_delete(args) -> int:
+	from Record_delete import _coerce_row, bulkDeleteRecord, deleteRecord
+	from Record_insert import _read_records
+
+	if args.file:
+		_, missing = bulkDeleteRecord(args.table, _read_records(args.file), args.chunk_size)
+		return 1 if missing else 0
+	pk_values = _coerce_row(_pairs(args.pk), _column_map(args.table))
+	if not pk_values:
+		raise ValueError("--pk is required")
+	return deleteRecord(args.table, pk_values)
+
+
+def _cmd_drop(args) -> int:
+	from sqlalchemy import text
+
+	from common.get_schema import invalidate_schema
+	from common.result_cache import invalidate_table
+	from common.sessionLocal import engine
+
+	_columns(args.table)
+	with engine.begin() as conn:
+		conn.execute(text(f'DROP TABLE "{args.table}"'))
+		invalidate_table(args.table, conn)
+	invalidate_schema(engine, args.table)
+	print(f"dropped: {args.table}")
+	return 0
+
+
+def _cmd_create(args) -> int:
+	import Table_create
+
+	Table_create.main()
+	return 0
+
+
+def _cmd_script(args) -> int:
+	try:
+		stream = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+	except OSError as exc:
+		print(f"cannot open script: {args.file}: {exc.strerror}")
+		return 1
+	failed = 0
+	try:
+		for line in stream:
+			line = line.strip()
+			if not line or line.startswith("#"):
+				continue
+			if run(shlex.split(line)) != 0:
+				failed += 1
+	finally:
+		if stream is not sys.stdin:
+			stream.close()
+	return 1 if failed else 0
+
+
+def _build_parser() -> argparse.ArgumentParser:
+	parser = argparse.ArgumentParser(prog="Db_cli.py")
+	subparsers = parser.add_subparsers(dest="command", required=True)
+
+	subparsers.add_parser("tables", help="list tables").set_defaults(handler=_cmd_tables)
+
+	ls_parser = subparsers.add_parser("ls", help="list records")
+	ls_parser.add_argument("table")
+	ls_parser.add_argument("--limit", type=int)
+	ls_parser.add_argument("--after")
+	ls_parser.set_defaults(handler=_cmd_ls)
+
+	select_parser = subparsers.add_parser("select", help="select records by column value")
+	select_parser.add_argument("table")
+	select_parser.add_argument("--where", action="append", metavar="COLUMN=VALUE")
+	select_parser.add_argument("--limit", type=int)
+	select_parser.add_argument("--after")
+	select_parser.set_defaults(handler=_cmd_select)
+
+	insert_parser = subparsers.add_parser("insert", help="insert a record or bulk load a file")
+	insert_parser.add_argument("table")
+	insert_parser.add_argument("--set", action="append", metavar="COLUMN=VALUE")
+	insert_parser.add_argument("--file", help="CSV or JSONL file to bulk load")
+	insert_parser.add_argument("--batch-size", type=int, default=10000)
+	insert_parser.set_defaults(handler=_cmd_insert)
+
+	upsert_parser = subparsers.add_parser("upsert", help="merge a file on a unique key")
+	upsert_parser.add_argument("table")
+	upsert_parser.add_argument("--file", required=True, help="CSV or JSONL file to merge")
+	upsert_parser.add_argument("--key", help="comma-separated unique key columns")
+	upsert_parser.add_argument("--batch-size", type=int, default=5000)
+	upsert_parser.set_defaults(handler=_cmd_upsert)
+
+	update_parser = subparsers.add_parser("update", help="update records by primary key")
+	update_parser.add_argument("table")
+	update_parser.add_argument("--pk", action="append", metavar="COLUMN=VALUE")
+	update_parser.add_argument("--set", action="append", metavar="COLUMN=VALUE")
+	update_parser.add_argument("--file", help="CSV or JSONL file of primary keys and new values")
+	update_parser.add_argument("--chunk-size", type=int, default=5000)
+	update_parser.set_defaults(handler=_cmd_update)
+
+	delete_parser = subparsers.add_parser("delete", help="delete records by primary key")
+	delete_parser.add_argument("table")
+	delete_parser.add_argument("--pk", action="append", metavar="COLUMN=VALUE")
+	delete_parser.add_argument("--file", help="CSV or JSONL file of primary keys to delete")
+	delete_parser.add_argument("--chunk-size", type=int, default=5000)
+	delete_parser.set_defaults(handler=_cmd_delete)
+
+	drop_parser = subparsers.add_parser("drop", help="drop a table")
+	drop_parser.add_argument("table")
+	drop_parser.set_defaults(handler=_cmd_drop)
+
+	subparsers.add_parser("create", help="create tables from the models").set_defaults(handler=_cmd_create)
+
+	script_parser = subparsers.add_parser("script", help="run one command per line in this process")
+	script_parser.add_argument("file", nargs="?", default="-", help="command file, '-' for stdin")
+	script_parser.set_defaults(handler=_cmd_script)
+	return parser
+
+
+def run(argv) -> int:
+	try:
+		args = _build_parser().parse_args(argv)
+	except SystemExit as exc:
+		return exc.code or 0
+	try:
+		return args.handler(args) or 0
+	except ValueError as exc:
+		print(exc)
+		return 1
+	except Exception as exc:
+		# sqlalchemy is imported lazily by the handlers, so it is only looked up once one has failed
+		from sqlalchemy.exc import SQLAlchemyError
+
+		if not isinstance(exc, SQLAlchemyError):
+			raise
+		print(f"{type(exc).__name__}: {str(exc).splitlines()[0]}")
+		return 1
+
+
+def main() -> int:
+	return run(sys.argv[1:])
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
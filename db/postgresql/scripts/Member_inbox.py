@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+import argparse
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from common.get_schema import get_columns, invalidate_schema
+from common.member_counters import refresh_member_trigger
+from common.sessionLocal import begin, engine, read_connect
+
+INBOX_COLUMNS = [
+	"room_id",
+	"room_name",
+	"is_direct",
+	"unread_count",
+	"message_id",
+	"body",
+	"created_at",
+	"sender_id",
+	"sender_email",
+]
+
+_LATERAL_LAST_MESSAGE = (
+	'LEFT JOIN LATERAL ('
+	'SELECT m."id", m."sender_id", m."body", m."created_at" FROM "messages" m '
+	'WHERE m."room_id" = cm."room_id" ORDER BY m."created_at" DESC, m."id" DESC LIMIT 1'
+	') AS lm ON true'
+)
+
+_POINTER_LAST_MESSAGE = (
+	'LEFT JOIN "messages" lm ON lm."id" = r."last_message_id" AND lm."created_at" = r."last_message_at"'
+)
+
+_LATEST_PER_ROOM = (
+	'SELECT r."id" AS "room_id", lm."id", lm."created_at" FROM "chat_rooms" r '
+	'LEFT JOIN LATERAL ('
+	'SELECT m."id", m."created_at" FROM "messages" m '
+	'WHERE m."room_id" = r."id" ORDER BY m."created_at" DESC, m."id" DESC LIMIT 1'
+	') AS lm ON true'
+)
+
+_INSTALL_SQL = [
+	'ALTER TABLE "chat_rooms" ADD COLUMN IF NOT EXISTS "last_message_id" integer',
+	'ALTER TABLE "chat_rooms" ADD COLUMN IF NOT EXISTS "last_message_at" timestamp',
+	'ALTER TABLE "chat_members" ADD COLUMN IF NOT EXISTS "last_activity_at" timestamp',
+	'CREATE INDEX IF NOT EXISTS "ix_chat_members_user_id_last_activity_at_room_id" '
+	'ON "chat_members" ("user_id", "last_activity_at", "room_id")',
+	# the composite index leads with user_id, so the single-column one is redundant
+	'DROP INDEX IF EXISTS "ix_chat_members_user_id"',
+	"""
+	CREATE OR REPLACE FUNCTION chat_rooms_last_message_on_insert() RETURNS trigger AS $$
+	BEGIN
+		UPDATE "chat_rooms" AS r SET "last_message_id" = l."id", "last_message_at" = l."created_at"
+		FROM (
+			SELECT DISTINCT ON ("room_id") "room_id", "id", "created_at"
+			FROM new_messages
+			ORDER BY "room_id", "created_at" DESC, "id" DESC
+		) AS l
+		WHERE r."id" = l."room_id"
+			AND (r."last_message_at" IS NULL
+				OR (l."created_at", l."id") > (r."last_message_at", r."last_message_id"));
+		-- chat_members.last_activity_at is kept by the shared triggers in common.member_counters
+		RETURN NULL;
+	END;
+	$$ LANGUAGE plpgsql
+	""",
+	"""
+	CREATE OR REPLACE FUNCTION chat_rooms_last_message_on_delete() RETURNS trigger AS $$
+	BEGIN
+		UPDATE "chat_rooms" AS r SET "last_message_id" = lm."id", "last_message_at" = lm."created_at"
+		FROM (SELECT DISTINCT "room_id", "id", "created_at" FROM old_messages) AS d
+		LEFT JOIN LATERAL (
+			SELECT m."id", m."created_at" FROM "messages" m
+			WHERE m."room_id" = d."room_id" ORDER BY m."created_at" DESC, m."id" DESC LIMIT 1
+		) AS lm ON true
+		WHERE r."id" = d."room_id" AND r."last_message_id" = d."id" AND r."last_message_at" = d."created_at";
+		RETURN NULL;
+	END;
+	$$ LANGUAGE plpgsql
+	""",
+	'DROP TRIGGER IF EXISTS "messages_room_last_message_insert" ON "messages"',
+	"""
+	CREATE TRIGGER "messages_room_last_message_insert" AFTER INSERT ON "messages"
+	REFERENCING NEW TABLE AS new_messages
+	FOR EACH STATEMENT EXECUTE FUNCTION chat_rooms_last_message_on_insert()
+	""",
+	'DROP TRIGGER IF EXISTS "messages_room_last_message_delete" ON "messages"',
+	"""
+	CREATE TRIGGER "messages_room_last_message_delete" AFTER DELETE ON "messages"
+	REFERENCING OLD TABLE AS old_messages
+	FOR EACH STATEMENT EXECUTE FUNCTION chat_rooms_last_message_on_delete()
+	""",
+	"""
+	CREATE OR REPLACE FUNCTION chat_members_last_activity_on_insert() RETURNS trigger AS $$
+	BEGIN
+		IF NEW."last_activity_at" IS NULL THEN
+			SELECT COALESCE(r."last_message_at", NEW."joined_at") INTO NEW."last_activity_at"
+			FROM "chat_rooms" r WHERE r."id" = NEW."room_id";
+		END IF;
+		RETURN NEW;
+	END;
+	$$ LANGUAGE plpgsql
+	""",
+	'DROP TRIGGER IF EXISTS "chat_members_last_activity_insert" ON "chat_members"',
+	"""
+	CREATE TRIGGER "chat_members_last_activity_insert" BEFORE INSERT ON "chat_members"
+	FOR EACH ROW EXECUTE FUNCTION chat_members_last_activity_on_insert()
+	""",
+]
+
+_UNINSTALL_SQL = [
+	'DROP TRIGGER IF EXISTS "messages_room_last_message_insert" ON "messages"',
+	'DROP TRIGGER IF EXISTS "messages_room_last_message_delete" ON "messages"',
+	"DROP FUNCTION IF EXISTS chat_rooms_last_message_on_insert()",
+	'DROP TRIGGER IF EXISTS "chat_members_last_activity_insert" ON "chat_members"',
+	"DROP FUNCTION IF EXISTS chat_rooms_last_message_on_delete()",
+	"DROP FUNCTION IF EXISTS chat_members_last_activity_on_insert()",
+]
+
+
+def _format_cursor(created_at: Optional[datetime], room_id: int) -> str:
+	return f"{'' if created_at is None else created_at.isoformat()},{room_id}"
+
+
+def _parse_cursor(cursor: str):
+	created_at, room_id = cursor.split(",", 1)
+	return (datetime.fromisoformat(created_at) if created_at else None), int(room_id)
+
+
+def _unread_column() -> str:
+	# unread_count comes from Member_unread's install; without it the column is reported empty
+	names = {column["name"] for column in get_columns(engine, "chat_members")}
+	return 'cm."unread_count"' if "unread_count" in names else "NULL"
+
+
+def _lateral_page(params: dict, cursor: Optional[str]):
+	page_clause = ""
+	if cursor is not None:
+		after_at, params["after_room"] = _parse_cursor(cursor)
+		if after_at is None:
+			page_clause = 'AND lm."created_at" IS NULL AND r."id" < :after_room '
+		else:
+			params["after_at"] = after_at
+			page_clause = (
+				'AND (lm."created_at" IS NULL OR (lm."created_at", r."id") < (:after_at, :after_room)) '
+			)
+	return 'lm."created_at"', page_clause, 'ORDER BY lm."created_at" DESC NULLS LAST, r."id" DESC'
+
+
+def _pointer_page(params: dict, cursor: Optional[str]):
+	# last_activity_at is never NULL once installed, so the keyset is a plain range on the member index
+	page_clause = ""
+	if cursor is not None:
+		params["after_at"], params["after_room"] = _parse_cursor(cursor)
+		page_clause = 'AND (cm."last_activity_at", cm."room_id") < (:after_at, :after_room) '
+	return 'cm."last_activity_at"', page_clause, 'ORDER BY cm."last_activity_at" DESC, cm."room_id" DESC'
+
+
+def fetch_inbox(
+	user_id: int,
+	limit: Optional[int] = None,
+	cursor: Optional[str] = None,
+	use_pointer: bool = False,
+	conn=None,
+):
+	params = {"user_id": user_id}
+	if use_pointer:
+		last_message = _POINTER_LAST_MESSAGE
+		activity_at, page_clause, order_clause = _pointer_page(params, cursor)
+	else:
+		last_message = _LATERAL_LAST_MESSAGE
+		activity_at, page_clause, order_clause = _lateral_page(params, cursor)
+	statement = (
+		f'SELECT r."id", r."name", r."is_direct", {_unread_column()}, '
+		f'lm."id", lm."body", lm."created_at", u."id", u."email", {activity_at} '
+		'FROM "chat_members" cm '
+		'JOIN "chat_rooms" r ON r."id" = cm."room_id" '
+		f"{last_message} "
+		'LEFT JOIN "users" u ON u."id" = lm."sender_id" '
+		f'WHERE cm."user_id" = :user_id {page_clause}'
+		f"{order_clause}"
+	)
+	if limit is not None:
+		statement += " LIMIT :limit"
+		params["limit"] = limit + 1
+	with read_connect(conn) as conn:
+		rows = conn.execute(text(statement), params).fetchall()
+	next_cursor = None
+	if limit is not None and len(rows) > limit:
+		rows = rows[:limit]
+		next_cursor = _format_cursor(rows[-1][-1], rows[-1][0])
+	return [tuple(row[:-1]) for row in rows], next_cursor
+
+
+def install_last_message_pointer(conn=None) -> int:
+	with begin(conn) as tx:
+		for statement in _INSTALL_SQL:
+			tx.execute(text(statement))
+		refresh_member_trigger(tx)
+		rebuilt = check_last_message_pointers(rebuild=True, conn=tx)
+	invalidate_schema(engine, "chat_rooms")
+	invalidate_schema(engine, "chat_members")
+	return rebuilt
+
+
+def uninstall_last_message_pointer(conn=None) -> None:
+	with begin(conn) as conn:
+		for statement in _UNINSTALL_SQL:
+			conn.execute(text(statement))
+		refresh_member_trigger(conn)
+
+
+def check_last_message_pointers(rebuild: bool = False, conn=None) -> int:
+	drift = (
+		'r."last_message_id" IS DISTINCT FROM actual."id" '
+		'OR r."last_message_at" IS DISTINCT FROM actual."created_at"'
+	)
+	expected_activity = 'COALESCE(actual."created_at", cm."joined_at")'
+	member_drift = f'cm."last_activity_at" IS DISTINCT FROM {expected_activity}'
+	if rebuild:
+		queries = {
+			"chat_rooms": (
+				f"WITH actual AS ({_LATEST_PER_ROOM}) "
+				'UPDATE "chat_rooms" r SET "last_message_id" = actual."id", "last_message_at" = actual."created_at" '
+				f'FROM actual WHERE r."id" = actual."room_id" AND ({drift}) RETURNING r."id"'
+			),
+			"chat_members": (
+				f"WITH actual AS ({_LATEST_PER_ROOM}) "
+				f'UPDATE "chat_members" cm SET "last_activity_at" = {expected_activity} '
+				f'FROM actual WHERE cm."room_id" = actual."room_id" AND {member_drift} RETURNING cm."id"'
+			),
+		}
+	else:
+		queries = {
+			"chat_rooms": (
+				f"WITH actual AS ({_LATEST_PER_ROOM}) "
+				'SELECT r."id" FROM "chat_rooms" r JOIN actual ON r."id" = actual."room_id" '
+				f"WHERE {drift}"
+			),
+			"chat_members": (
+				f"WITH actual AS ({_LATEST_PER_ROOM}) "
+				'SELECT cm."id" FROM "chat_members" cm JOIN actual ON cm."room_id" = actual."room_id" '
+				f"WHERE {member_drift}"
+			),
+		}
+	action = "rebuilt" if rebuild else "drifted"
+	total = 0
+	with begin(conn) as conn:
+		for table_name, query in queries.items():
+			drifted = len(conn.execute(text(query)).fetchall())
+			print(f"{action}: {table_name} rows={drifted}")
+			total += drifted
+	return total
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	subparsers = parser.add_subparsers(dest="command", required=True)
+	list_parser = subparsers.add_parser("list", help="rooms of a user with their latest message")
+	list_parser.add_argument("user_id", type=int)
+	list_parser.add_argument("--limit", type=int, help="page size")
+	list_parser.add_argument("--cursor", help="cursor returned by the previous page")
+	list_parser.add_argument(
+		"--pointer", action="store_true", help="page on the materialized per-member activity and last-message pointer"
+	)
+	subparsers.add_parser("install", help="add the last-message pointer and member activity columns and triggers")
+	subparsers.add_parser("uninstall", help="drop the last-message pointer triggers")
+	check_parser = subparsers.add_parser("check", help="compare pointers with the actual latest messages")
+	check_parser.add_argument("--rebuild", action="store_true", help="rewrite drifted pointers")
+	args = parser.parse_args()
+
+	if args.command == "list":
+		try:
+			rows, next_cursor = fetch_inbox(args.user_id, args.limit, args.cursor, args.pointer)
+		except ValueError:
+			print(f"invalid cursor: {args.cursor}")
+			return 1
+		if not rows:
+			print("no records found")
+			return 0
+		print("\t".join(INBOX_COLUMNS))
+		for row in rows:
+			print("\t".join("" if value is None else str(value) for value in row))
+		if next_cursor is not None:
+			print(f"next: --cursor {next_cursor}")
+		return 0
+	if args.command == "install":
+		install_last_message_pointer()
+		return 0
+	if args.command == "uninstall":
+		uninstall_last_message_pointer()
+		print("uninstalled: last message pointer triggers")
+		return 0
+	drifted = check_last_message_pointers(args.rebuild)
+	return 1 if drifted and not args.rebuild else 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
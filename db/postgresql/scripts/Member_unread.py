@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+import argparse
+
+from sqlalchemy import text
+
+from common.get_schema import invalidate_schema
+from common.member_counters import UNREAD_MATCH as _UNREAD_MATCH, refresh_member_trigger
+from common.sessionLocal import begin, connect, engine
+
+_ACTUAL_COUNTS = (
+	'SELECT cm."id", count(m."id") AS "unread" '
+	'FROM "chat_members" cm LEFT JOIN "messages" m ON ' + _UNREAD_MATCH + ' '
+	'GROUP BY cm."id"'
+)
+
+_INSTALL_SQL = [
+	'ALTER TABLE "chat_members" ADD COLUMN IF NOT EXISTS "unread_count" integer NOT NULL DEFAULT 0',
+	# inserts are counted by the shared trigger in common.member_counters; drop the old per-feature one
+	'DROP TRIGGER IF EXISTS "messages_unread_count" ON "messages"',
+	"DROP FUNCTION IF EXISTS chat_members_unread_on_message()",
+	"""
+	CREATE OR REPLACE FUNCTION chat_members_unread_on_read() RETURNS trigger AS $$
+	BEGIN
+		SELECT count(*) INTO NEW."unread_count"
+		FROM "messages" m
+		WHERE m."room_id" = NEW."room_id"
+			AND m."created_at" > coalesce(NEW."last_read_at", '-infinity'::timestamp)
+			AND m."sender_id" IS DISTINCT FROM NEW."user_id";
+		RETURN NEW;
+	END;
+	$$ LANGUAGE plpgsql
+	""",
+	'DROP TRIGGER IF EXISTS "chat_members_unread_count" ON "chat_members"',
+	"""
+	CREATE TRIGGER "chat_members_unread_count" BEFORE INSERT OR UPDATE OF "last_read_at" ON "chat_members"
+	FOR EACH ROW EXECUTE FUNCTION chat_members_unread_on_read()
+	""",
+]
+
+_UNINSTALL_SQL = [
+	'DROP TRIGGER IF EXISTS "chat_members_unread_count" ON "chat_members"',
+	"DROP FUNCTION IF EXISTS chat_members_unread_on_read()",
+]
+
+
+def fetch_unread_counts(user_id: int, use_counter: bool = False, conn=None) -> dict:
+	if use_counter:
+		query = 'SELECT "room_id", "unread_count" FROM "chat_members" WHERE "user_id" = :user_id'
+	else:
+		query = (
+			'SELECT cm."room_id", count(m."id") FROM "chat_members" cm '
+			'LEFT JOIN "messages" m ON ' + _UNREAD_MATCH + ' '
+			'WHERE cm."user_id" = :user_id GROUP BY cm."room_id"'
+		)
+	with connect(conn) as conn:
+		return {room_id: unread for room_id, unread in conn.execute(text(query), {"user_id": user_id})}
+
+
+def install_unread_counter(conn=None) -> int:
+	with begin(conn) as tx:
+		for statement in _INSTALL_SQL:
+			tx.execute(text(statement))
+		refresh_member_trigger(tx)
+		rebuilt = check_unread_counters(rebuild=True, conn=tx)
+	invalidate_schema(engine, "chat_members")
+	return rebuilt
+
+
+def uninstall_unread_counter(conn=None) -> None:
+	with begin(conn) as conn:
+		for statement in _UNINSTALL_SQL:
+			conn.execute(text(statement))
+		refresh_member_trigger(conn)
+
+
+def check_unread_counters(rebuild: bool = False, conn=None) -> int:
+	if rebuild:
+		query = (
+			f'WITH actual AS ({_ACTUAL_COUNTS}) '
+			'UPDATE "chat_members" cm SET "unread_count" = actual."unread" FROM actual '
+			'WHERE cm."id" = actual."id" AND cm."unread_count" <> actual."unread" RETURNING cm."id"'
+		)
+	else:
+		query = (
+			f'WITH actual AS ({_ACTUAL_COUNTS}) '
+			'SELECT cm."id" FROM "chat_members" cm JOIN actual ON cm."id" = actual."id" '
+			'WHERE cm."unread_count" <> actual."unread"'
+		)
+	with begin(conn) as conn:
+		drifted = len(conn.execute(text(query)).fetchall())
+	action = "rebuilt" if rebuild else "drifted"
+	print(f"{action}: chat_members rows={drifted}")
+	return drifted
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	subparsers = parser.add_subparsers(dest="command", required=True)
+	counts_parser = subparsers.add_parser("counts", help="unread counts for every room of a user")
+	counts_parser.add_argument("user_id", type=int)
+	counts_parser.add_argument("--counter", action="store_true", help="read the denormalized counter")
+	subparsers.add_parser("install", help="add the unread counter column and triggers")
+	subparsers.add_parser("uninstall", help="drop the unread counter triggers")
+	check_parser = subparsers.add_parser("check", help="compare counters with actual unread counts")
+	check_parser.add_argument("--rebuild", action="store_true", help="rewrite drifted counters")
+	args = parser.parse_args()
+
+	if args.command == "counts":
+		counts = fetch_unread_counts(args.user_id, args.counter)
+		if not counts:
+			print("no records found")
+			return 0
+		print("room_id\tunread")
+		for room_id, unread in sorted(counts.items()):
+			print(f"{room_id}\t{unread}")
+		return 0
+	if args.command == "install":
+		install_unread_counter()
+		return 0
+	if args.command == "uninstall":
+		uninstall_unread_counter()
+		print("uninstalled: unread counter triggers")
+		return 0
+	drifted = check_unread_counters(args.rebuild)
+	return 1 if drifted and not args.rebuild else 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
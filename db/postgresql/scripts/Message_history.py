@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+import argparse
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from common.get_schema import invalidate_schema
+from common.sessionLocal import connect, engine
+
+HISTORY_COLUMNS = ["id", "room_id", "sender_id", "body", "is_system", "created_at", "updated_at"]
+HISTORY_INDEX = "ix_messages_room_id_created_at_id"
+SUPERSEDED_INDEX = "ix_messages_room_id"
+
+
+def _format_cursor(created_at: datetime, message_id: int) -> str:
+	return f"{created_at.isoformat()},{message_id}"
+
+
+def _parse_cursor(cursor: str):
+	created_at, message_id = cursor.rsplit(",", 1)
+	return datetime.fromisoformat(created_at), int(message_id)
+
+
+def fetch_room_history(room_id: int, before: Optional[str] = None, limit: int = 50, conn=None):
+	columns = ", ".join(f'"{name}"' for name in HISTORY_COLUMNS)
+	params = {"room_id": room_id, "limit": limit + 1}
+	where_clause = '"room_id" = :room_id'
+	if before is not None:
+		params["before_created_at"], params["before_id"] = _parse_cursor(before)
+		where_clause += ' AND ("created_at", "id") < (:before_created_at, :before_id)'
+	with connect(conn) as conn:
+		rows = conn.execute(
+			text(
+				f'SELECT {columns} FROM "messages" WHERE {where_clause} '
+				'ORDER BY "created_at" DESC, "id" DESC LIMIT :limit'
+			),
+			params,
+		).fetchall()
+	next_cursor = None
+	if len(rows) > limit:
+		rows = rows[:limit]
+		last = rows[-1]._mapping
+		next_cursor = _format_cursor(last["created_at"], last["id"])
+	return rows, next_cursor
+
+
+def _index_valid(conn, name: str) -> Optional[bool]:
+	return conn.execute(
+		text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+		{"name": name},
+	).scalar()
+
+
+def install_history_index() -> None:
+	# CONCURRENTLY cannot run in a transaction block and is not supported on partitioned tables
+	with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+		partitioned = conn.execute(
+			text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('messages')")
+		).scalar()
+		concurrently = "" if partitioned else " CONCURRENTLY"
+		if _index_valid(conn, HISTORY_INDEX) is False:
+			# a previously interrupted concurrent build leaves an invalid index behind
+			conn.execute(text(f'DROP INDEX{concurrently} IF EXISTS "{HISTORY_INDEX}"'))
+		conn.execute(
+			text(
+				f'CREATE INDEX{concurrently} IF NOT EXISTS "{HISTORY_INDEX}" '
+				'ON "messages" ("room_id", "created_at", "id")'
+			)
+		)
+		conn.execute(text(f'DROP INDEX{concurrently} IF EXISTS "{SUPERSEDED_INDEX}"'))
+	invalidate_schema(engine, "messages")
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("room_id", type=int, nargs="?")
+	parser.add_argument("--before", help="cursor returned by the previous page")
+	parser.add_argument("--limit", type=int, default=50)
+	parser.add_argument(
+		"--install", action="store_true", help="build the composite history index on an existing table and drop the room_id one"
+	)
+	args = parser.parse_args()
+
+	if args.install:
+		install_history_index()
+		print(f"installed: {HISTORY_INDEX}")
+		return 0
+	if args.room_id is None:
+		print("room id required")
+		return 1
+	try:
+		rows, next_cursor = fetch_room_history(args.room_id, args.before, args.limit)
+	except ValueError:
+		print(f"invalid cursor: {args.before}")
+		return 1
+	if not rows:
+		print("no records found")
+		return 0
+	print("\t".join(HISTORY_COLUMNS))
+	for row in rows:
+		print("\t".join("" if value is None else str(value) for value in row))
+	if next_cursor is not None:
+		print(f"next: --before {next_cursor}")
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+import argparse
+from typing import Optional
+
+from sqlalchemy import text
+
+from common.get_schema import invalidate_schema
+from common.models import TEXT_SEARCH_CONFIG
+from common.sessionLocal import connect, engine
+from Message_history import _index_valid
+
+SEARCH_COLUMNS = ["id", "room_id", "sender_id", "body", "created_at", "rank"]
+SEARCH_INDEX = "ix_messages_body_tsv"
+
+
+def _format_cursor(rank: float, message_id: int) -> str:
+	return f"{rank!r},{message_id}"
+
+
+def _parse_cursor(cursor: str):
+	rank, message_id = cursor.split(",", 1)
+	return float(rank), int(message_id)
+
+
+def search_messages(
+	query: str,
+	room_id: Optional[int] = None,
+	limit: int = 20,
+	cursor: Optional[str] = None,
+	conn=None,
+):
+	params = {"query": query, "limit": limit + 1}
+	match_clause = 'm."body_tsv" @@ q'
+	if room_id is not None:
+		match_clause += ' AND m."room_id" = :room_id'
+		params["room_id"] = room_id
+	page_clause = ""
+	if cursor is not None:
+		params["after_rank"], params["after_id"] = _parse_cursor(cursor)
+		page_clause = 'WHERE ("rank", "id") < (CAST(:after_rank AS real), :after_id)'
+	statement = (
+		'SELECT "id", "room_id", "sender_id", "body", "created_at", "rank" FROM ('
+		'SELECT m."id", m."room_id", m."sender_id", m."body", m."created_at", '
+		'ts_rank_cd(m."body_tsv", q) AS "rank" '
+		f"FROM \"messages\" m, websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', :query) AS q "
+		f"WHERE {match_clause}"
+		f') AS hits {page_clause} ORDER BY "rank" DESC, "id" DESC LIMIT :limit'
+	)
+	with connect(conn) as conn:
+		rows = conn.execute(text(statement), params).fetchall()
+	next_cursor = None
+	if len(rows) > limit:
+		rows = rows[:limit]
+		last = rows[-1]._mapping
+		next_cursor = _format_cursor(last["rank"], last["id"])
+	return rows, next_cursor
+
+
+def install_message_search() -> None:
+	# CONCURRENTLY cannot run in a transaction block and is not supported on partitioned tables
+	with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+		conn.execute(
+			text(
+				'ALTER TABLE "messages" ADD COLUMN IF NOT EXISTS "body_tsv" tsvector '
+				f"GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', \"body\")) STORED"
+			)
+		)
+		partitioned = conn.execute(
+			text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('messages')")
+		).scalar()
+		concurrently = "" if partitioned else " CONCURRENTLY"
+		if _index_valid(conn, SEARCH_INDEX) is False:
+			# a previously interrupted concurrent build leaves an invalid index behind
+			conn.execute(text(f'DROP INDEX{concurrently} IF EXISTS "{SEARCH_INDEX}"'))
+		conn.execute(
+			text(f'CREATE INDEX{concurrently} IF NOT EXISTS "{SEARCH_INDEX}" ON "messages" USING gin ("body_tsv")')
+		)
+	invalidate_schema(engine, "messages")
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("query", nargs="?", help="web-search style query")
+	parser.add_argument("--room", type=int, help="limit hits to one room")
+	parser.add_argument("--limit", type=int, default=20)
+	parser.add_argument("--cursor", help="cursor returned by the previous page")
+	parser.add_argument("--install", action="store_true", help="add the tsvector column and GIN index to an existing table")
+	args = parser.parse_args()
+
+	if args.install:
+		install_message_search()
+		print("installed: messages full-text search")
+		return 0
+	if not args.query:
+		print("query required")
+		return 1
+	try:
+		rows, next_cursor = search_messages(args.query, args.room, args.limit, args.cursor)
+	except ValueError:
+		print(f"invalid cursor: {args.cursor}")
+		return 1
+	if not rows:
+		print("no records found")
+		return 0
+	print("\t".join(SEARCH_COLUMNS))
+	for row in rows:
+		print("\t".join("" if value is None else str(value) for value in row))
+	if next_cursor is not None:
+		print(f"next: --cursor {next_cursor}")
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+from typing import Optional
+
+from sqlalchemy import text
+
+from common.asyncSessionLocal import async_begin, async_connect
+from common.get_schema import get_columns, get_pk_columns
+from common.result_cache import invalidate_table
+from Record_ls import _build_select
+
+
+async def _single_pk(conn, table_name: str) -> Optional[str]:
+	pk_columns = await conn.run_sync(get_pk_columns, table_name)
+	if len(pk_columns) != 1:
+		return None
+	return pk_columns[0]
+
+
+async def _fetch_rows(
+	table_name: str,
+	column_name: Optional[str],
+	value,
+	limit: Optional[int],
+	after,
+	conn=None,
+) -> list:
+	async with async_connect(conn) as conn:
+		if not await conn.run_sync(get_columns, table_name):
+			print(f"no columns found: {table_name}")
+			return []
+		pk_column = None
+		if limit is not None or after is not None:
+			pk_column = await _single_pk(conn, table_name)
+			if pk_column is None:
+				print(f"keyset pagination requires a single-column primary key: {table_name}")
+				return []
+		query, params = _build_select(table_name, pk_column, column_name, value, limit, after)
+		result = await conn.execute(text(query), params)
+		return result.fetchall()
+
+
+async def lsRecordAsync(table_name: str, limit: Optional[int] = None, after=None, conn=None) -> list:
+	return await _fetch_rows(table_name, None, None, limit, after, conn)
+
+
+async def selectRecordAsync(
+	table_name: str,
+	column_name: Optional[str],
+	value,
+	limit: Optional[int] = None,
+	after=None,
+	conn=None,
+) -> list:
+	return await _fetch_rows(table_name, column_name, value, limit, after, conn)
+
+
+async def insertRecordAsync(table_name: str, record: dict, conn=None) -> None:
+	if not record:
+		print("no record data")
+		return
+	columns = ", ".join(f'"{column}"' for column in record.keys())
+	placeholders = ", ".join(f":{column}" for column in record.keys())
+	async with async_begin(conn) as conn:
+		await conn.execute(
+			text(f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders})'),
+			record,
+		)
+		# same transaction as the insert, so the NOTIFY is only delivered if it commits
+		await conn.run_sync(lambda sync_conn: invalidate_table(table_name, sync_conn))
+
+
+async def _main(table_names: list, limit: Optional[int]) -> None:
+	results = await asyncio.gather(*(lsRecordAsync(table_name, limit) for table_name in table_names))
+	for table_name, rows in zip(table_names, results):
+		print(f"{table_name}: rows={len(rows)}")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("tables", nargs="+", help="tables to read concurrently")
+	parser.add_argument("--limit", type=int, help="page size per table")
+	args = parser.parse_args()
+	asyncio.run(_main(args.tables, args.limit))
+
+
+if __name__ == "__main__":
+	main()
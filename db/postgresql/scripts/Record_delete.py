@@ -1,11 +1,19 @@
 #!/usr/bin/env python3
+import argparse
 from datetime import datetime
+from itertools import islice
+from typing import Iterable
 
-from sqlalchemy import Boolean, DateTime, Integer, inspect, text
+from sqlalchemy import Boolean, DateTime, Integer, text
 
-from common.get_db import get_db
+from common.get_schema import get_columns, get_pk_columns
+from common.result_cache import invalidate_table
+from common.sessionLocal import begin, engine
+from Record_insert import _read_records
 from Table_ls import lsTable
 
+CHUNK_SIZE = 5000
+
 
 def _parse_value(raw_value: str, column_type):
 	if isinstance(column_type, Integer):
@@ -38,59 +46,120 @@ def _prompt_pk_values(columns, pk_columns) -> dict:
 	return pk_values
 
 
-def deleteRecord(table_name: str, pk_values: dict) -> int:
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		engine = db.get_bind()
-		where_clause = " AND ".join(f'"{name}" = :{name}' for name in pk_values.keys())
-		with engine.begin() as conn:
-			result = conn.execute(
-				text(f'SELECT 1 FROM "{table_name}" WHERE {where_clause}'),
-				pk_values,
-			)
-			if result.fetchone() is None:
-				print("record not found")
-				return 1
-			conn.execute(
-				text(f'DELETE FROM "{table_name}" WHERE {where_clause}'),
-				pk_values,
-			)
-		print(f"deleted: {table_name}")
-		return 0
-	finally:
-		db_gen.close()
+def _coerce_row(row: dict, column_map: dict) -> dict:
+	coerced = {}
+	for name, raw_value in row.items():
+		if name not in column_map:
+			raise ValueError(f"column not found: {name}")
+		if raw_value is None or raw_value == "":
+			coerced[name] = None
+		elif isinstance(raw_value, str):
+			try:
+				coerced[name] = _parse_value(raw_value, column_map[name])
+			except ValueError:
+				raise ValueError(f"invalid value: {name}") from None
+		else:
+			coerced[name] = raw_value
+	return coerced
 
 
-def main() -> int:
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		engine = db.get_bind()
-		tables = lsTable(engine)
-		if not tables:
-			print("no tables found")
+def _array_type(column_type) -> str:
+	return f"{column_type.compile(dialect=engine.dialect)}[]"
+
+
+def _pk_match(pk_columns, column_map: dict) -> str:
+	if len(pk_columns) == 1:
+		name = pk_columns[0]
+		return f'"{name}" = ANY(CAST(:pk_{name} AS {_array_type(column_map[name])}))'
+	targets = ", ".join(f'"{name}"' for name in pk_columns)
+	arrays = ", ".join(f"CAST(:pk_{name} AS {_array_type(column_map[name])})" for name in pk_columns)
+	return f"({targets}) IN (SELECT * FROM unnest({arrays}))"
+
+
+def deleteRecord(table_name: str, pk_values: dict, conn=None) -> int:
+	where_clause = " AND ".join(f'"{name}" = :{name}' for name in pk_values.keys())
+	with begin(conn) as conn:
+		result = conn.execute(
+			text(f'DELETE FROM "{table_name}" WHERE {where_clause} RETURNING 1'),
+			pk_values,
+		)
+		if result.fetchone() is None:
+			print("record not found")
 			return 1
+		invalidate_table(table_name, conn)
+	print(f"deleted: {table_name}")
+	return 0
+
+
+def bulkDeleteRecord(
+	table_name: str,
+	pk_rows: Iterable[dict],
+	chunk_size: int = CHUNK_SIZE,
+	conn=None,
+):
+	pk_columns = get_pk_columns(engine, table_name)
+	column_map = {column["name"]: column["type"] for column in get_columns(engine, table_name)}
+	returning = ", ".join(f'"{name}"' for name in pk_columns)
+	query = text(
+		f'DELETE FROM "{table_name}" WHERE {_pk_match(pk_columns, column_map)} RETURNING {returning}'
+	)
+	deleted = 0
+	missing = []
+	rows = iter(pk_rows)
+	while True:
+		chunk = [_coerce_row(row, column_map) for row in islice(rows, chunk_size)]
+		if not chunk:
+			break
+		keys = [tuple(row.get(name) for name in pk_columns) for row in chunk]
+		params = {f"pk_{name}": [key[i] for key in keys] for i, name in enumerate(pk_columns)}
+		with begin(conn) as tx:
+			found = {tuple(row) for row in tx.execute(query, params)}
+			invalidate_table(table_name, tx)
+		deleted += len(found)
+		missing.extend(key for key in dict.fromkeys(keys) if key not in found)
+	print(f"deleted: {table_name} rows={deleted} missing={len(missing)}")
+	return deleted, missing
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--file", help="CSV or JSONL file of primary keys to delete")
+	parser.add_argument("--table", help="target table name")
+	parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+	args = parser.parse_args()
+
+	tables = lsTable(engine)
+	if not tables:
+		print("no tables found")
+		return 1
+	table_name = args.table
+	if table_name is None:
 		for table in tables:
 			print(table)
 		table_name = input("delete table name: ").strip()
-		if table_name not in tables:
-			print(f"table not found: {table_name}")
-			return 1
-		inspector = inspect(engine)
-		columns = inspector.get_columns(table_name)
-		if not columns:
-			print(f"no columns found: {table_name}")
-			return 1
-		pk_columns = inspector.get_pk_constraint(table_name).get("constrained_columns", [])
-		if not pk_columns:
-			print(f"no primary key found: {table_name}")
-			return 1
-		pk_values = _prompt_pk_values(columns, pk_columns)
-		if not pk_values:
+	if table_name not in tables:
+		print(f"table not found: {table_name}")
+		return 1
+	columns = get_columns(engine, table_name)
+	if not columns:
+		print(f"no columns found: {table_name}")
+		return 1
+	pk_columns = get_pk_columns(engine, table_name)
+	if not pk_columns:
+		print(f"no primary key found: {table_name}")
+		return 1
+	if args.file:
+		try:
+			_, missing = bulkDeleteRecord(table_name, _read_records(args.file), args.chunk_size)
+		except ValueError as exc:
+			print(exc)
 			return 1
-	finally:
-		db_gen.close()
+		for key in missing:
+			print(f"record not found: {', '.join(str(value) for value in key)}")
+		return 0
+	pk_values = _prompt_pk_values(columns, pk_columns)
+	if not pk_values:
+		return 1
 
 	return deleteRecord(table_name, pk_values)
 
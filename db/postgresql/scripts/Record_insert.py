@@ -1,12 +1,24 @@
 #!/usr/bin/env python3
+import argparse
+import csv
+import json
+import time
 from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator
 
-from sqlalchemy import Boolean, DateTime, Integer, inspect, text
+from sqlalchemy import Boolean, DateTime, Integer, text
 
-from common.get_db import get_db
+from common.copy_csv import copy_rows
+from common.get_schema import get_columns, get_pk_columns
+from common.result_cache import invalidate_table
+from common.sessionLocal import begin, connect, engine
 from Record_ls import lsRecord
 from Table_ls import lsTable
 
+BATCH_SIZE = 10000
+COPY_MIN_ROWS = 1000
+
 
 def _parse_value(raw_value: str, column_type):
 	if isinstance(column_type, Integer):
@@ -23,15 +35,21 @@ def _parse_value(raw_value: str, column_type):
 	return raw_value
 
 
+def _get_columns(engine, table_name: str):
+	columns = get_columns(engine, table_name)
+	pk_columns = set(get_pk_columns(engine, table_name))
+	return columns, pk_columns
+
+
 def _prompt_record(engine, table_name: str) -> dict:
-	inspector = inspect(engine)
-	columns = inspector.get_columns(table_name)
-	pk_columns = set(inspector.get_pk_constraint(table_name).get("constrained_columns", []))
+	columns, pk_columns = _get_columns(engine, table_name)
 	record = {}
 	for column in columns:
 		name = column["name"]
 		if name in pk_columns and column.get("autoincrement", False):
 			continue
+		if column.get("computed"):
+			continue
 		is_timestamp = isinstance(column["type"], DateTime)
 		default_timestamp = None
 		if is_timestamp:
@@ -57,44 +75,147 @@ def _prompt_record(engine, table_name: str) -> dict:
 	return record
 
 
-def insertRecord(table_name: str, record: dict) -> None:
+def insertRecord(table_name: str, record: dict, conn=None) -> bool:
 	if not record:
 		print("no record data")
-		return
-	db_gen = get_db()
-	db = next(db_gen)
+		return False
+	columns = ", ".join(f'"{column}"' for column in record.keys())
+	placeholders = ", ".join(f":{column}" for column in record.keys())
+	with begin(conn) as conn:
+		conn.execute(
+			text(f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders})'),
+			record,
+		)
+		invalidate_table(table_name, conn)
+	return True
+
+
+def _read_records(path: str) -> Iterator[dict]:
+	with open(path, newline="", encoding="utf-8") as f:
+		if path.endswith(".csv"):
+			yield from csv.DictReader(f)
+			return
+		for line in f:
+			line = line.strip()
+			if line:
+				yield json.loads(line)
+
+
+def _coerce_record(record: dict, column_map: dict, pk_columns, default_timestamp: datetime) -> dict:
+	coerced = {}
+	for name, raw_value in record.items():
+		if name not in column_map:
+			raise ValueError(f"column not found: {name}")
+		if raw_value is None or raw_value == "":
+			coerced[name] = None
+		elif isinstance(raw_value, str):
+			try:
+				coerced[name] = _parse_value(raw_value, column_map[name]["type"])
+			except ValueError:
+				raise ValueError(f"invalid value: {name}") from None
+		else:
+			coerced[name] = raw_value
+	for name, column in column_map.items():
+		if name in coerced or name in pk_columns:
+			continue
+		if isinstance(column["type"], DateTime) and not column.get("nullable", False):
+			coerced[name] = default_timestamp
+	return coerced
+
+
+def _group_rows(columns, batch: list) -> list:
+	# rows are grouped by the columns they set, so a missing key keeps its column default instead of NULL
+	groups = {}
+	for row in batch:
+		names = tuple(column["name"] for column in columns if column["name"] in row)
+		groups.setdefault(names, []).append(row)
+	return list(groups.items())
+
+
+def _copy_batch(conn, table_name: str, names: list, batch: list) -> None:
+	cursor = conn.connection.cursor()
 	try:
-		engine = db.get_bind()
-		columns = ", ".join(f'"{column}"' for column in record.keys())
-		placeholders = ", ".join(f":{column}" for column in record.keys())
-		with engine.begin() as conn:
-			conn.execute(
-				text(f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders})'),
-				record,
-			)
+		copy_rows(cursor, table_name, names, ([row[name] for name in names] for row in batch))
 	finally:
-		db_gen.close()
+		cursor.close()
+
+
+def _executemany_batch(conn, table_name: str, names: list, batch: list) -> None:
+	columns = ", ".join(f'"{name}"' for name in names)
+	placeholders = ", ".join(f":{name}" for name in names)
+	conn.execute(
+		text(f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders})'),
+		[{name: row[name] for name in names} for row in batch],
+	)
+
+
+def bulkInsertRecord(
+	table_name: str,
+	records: Iterable[dict],
+	batch_size: int = BATCH_SIZE,
+	copy_min_rows: int = COPY_MIN_ROWS,
+	conn=None,
+) -> int:
+	columns, pk_columns = _get_columns(engine, table_name)
+	if not columns:
+		print(f"no columns found: {table_name}")
+		return 0
+	column_map = {column["name"]: column for column in columns}
+	default_timestamp = datetime.utcnow()
+	rows = (_coerce_record(record, column_map, pk_columns, default_timestamp) for record in records)
+	total = 0
+	started = time.perf_counter()
+	with connect(conn) as conn:
+		while True:
+			try:
+				batch = list(islice(rows, batch_size))
+			except ValueError:
+				print(f"stopped: {table_name} rows={total} committed before the invalid record")
+				raise
+			if not batch:
+				break
+			with begin(conn):
+				for names, group in _group_rows(columns, batch):
+					if len(group) >= copy_min_rows:
+						_copy_batch(conn, table_name, names, group)
+					else:
+						_executemany_batch(conn, table_name, names, group)
+				invalidate_table(table_name, conn)
+			total += len(batch)
+	elapsed = time.perf_counter() - started
+	rate = total / elapsed if elapsed > 0 else 0.0
+	print(f"inserted: {table_name} rows={total} elapsed={elapsed:.2f}s rate={rate:.0f} rows/s")
+	return total
 
 
 def main() -> int:
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		engine = db.get_bind()
-		tables = lsTable(engine)
-		if not tables:
-			print("no tables found")
-			return 1
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--file", help="CSV or JSONL file to bulk load")
+	parser.add_argument("--table", help="target table name")
+	parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+	args = parser.parse_args()
+
+	tables = lsTable(engine)
+	if not tables:
+		print("no tables found")
+		return 1
+	table_name = args.table
+	if table_name is None:
 		for table in tables:
 			print(table)
 		table_name = input("insert table name: ").strip()
-		if table_name not in tables:
-			print(f"table not found: {table_name}")
-			return 1
-		record = _prompt_record(engine, table_name)
-	finally:
-		db_gen.close()
+	if table_name not in tables:
+		print(f"table not found: {table_name}")
+		return 1
 
+	if args.file:
+		try:
+			bulkInsertRecord(table_name, _read_records(args.file), args.batch_size)
+		except ValueError as exc:
+			print(exc)
+			return 1
+		return 0
+	record = _prompt_record(engine, table_name)
 	insertRecord(table_name, record)
 	lsRecord(table_name)
 	return 0
@@ -1,51 +1,109 @@
 #!/usr/bin/env python3
-from sqlalchemy import inspect, text
+import argparse
+from typing import Optional
 
-from common.get_db import get_db
+from sqlalchemy import text
+
+from common.get_schema import get_columns, get_pk_columns
+from common.sessionLocal import engine, read_connect, read_engine
 from Table_ls import lsTable
 
+STREAM_BATCH_SIZE = 1000
 
-def lsRecord(table_name: str) -> None:
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		engine = db.get_bind()
-		columns = [col["name"] for col in inspect(engine).get_columns(table_name)]
-		if not columns:
-			print(f"no columns found: {table_name}")
-			return
-		with engine.connect() as conn:
-			result = conn.execute(text(f'SELECT * FROM "{table_name}"'))
-			rows = result.fetchall()
-		if not rows:
-			print("no records found")
+
+def _build_select(
+	table_name: str,
+	pk_column: Optional[str],
+	column_name: Optional[str] = None,
+	value=None,
+	limit: Optional[int] = None,
+	after=None,
+):
+	clauses = []
+	params = {}
+	if column_name:
+		clauses.append(f'"{column_name}" = :value')
+		params["value"] = value
+	if after is not None:
+		clauses.append(f'"{pk_column}" > :after')
+		params["after"] = after
+	query = f'SELECT * FROM "{table_name}"'
+	if clauses:
+		query += " WHERE " + " AND ".join(clauses)
+	if limit is not None or after is not None:
+		query += f' ORDER BY "{pk_column}"'
+	if limit is not None:
+		query += " LIMIT :limit"
+		params["limit"] = limit
+	return query, params
+
+
+def _single_pk(engine, table_name: str) -> Optional[str]:
+	pk_columns = get_pk_columns(engine, table_name)
+	if len(pk_columns) != 1:
+		return None
+	return pk_columns[0]
+
+
+def _print_rows(rows, columns, pk_column: Optional[str] = None):
+	count = 0
+	last_pk = None
+	for row in rows:
+		if count == 0:
+			print("\t".join(columns))
+		print("\t".join("" if value is None else str(value) for value in row))
+		if pk_column is not None:
+			last_pk = row._mapping[pk_column]
+		count += 1
+	if count == 0:
+		print("no records found")
+	return count, last_pk
+
+
+def _stream_rows(conn, query: str, params: dict, columns, pk_column: Optional[str] = None):
+	result = conn.execution_options(yield_per=STREAM_BATCH_SIZE).execute(text(query), params)
+	return _print_rows(result, columns, pk_column)
+
+
+def lsRecord(table_name: str, limit: Optional[int] = None, after=None, conn=None) -> None:
+	columns = [col["name"] for col in get_columns(engine, table_name)]
+	if not columns:
+		print(f"no columns found: {table_name}")
+		return
+	pk_column = None
+	if limit is not None or after is not None:
+		pk_column = _single_pk(engine, table_name)
+		if pk_column is None:
+			print(f"keyset pagination requires a single-column primary key: {table_name}")
 			return
-		print("\t".join(columns))
-		for row in rows:
-			print("\t".join("" if value is None else str(value) for value in row))
-	finally:
-		db_gen.close()
+	query, params = _build_select(table_name, pk_column, limit=limit, after=after)
+	with read_connect(conn) as conn:
+		count, last_pk = _stream_rows(conn, query, params, columns, pk_column)
+	if limit is not None and count == limit:
+		print(f"next: --after {last_pk}")
 
 
 def main() -> None:
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		engine = db.get_bind()
-		tables = lsTable(engine)
-		if not tables:
-			print("no tables found")
-			return
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--table", help="table name")
+	parser.add_argument("--limit", type=int, help="page size")
+	parser.add_argument("--after", help="primary key value to continue after")
+	args = parser.parse_args()
+
+	tables = lsTable(read_engine())
+	if not tables:
+		print("no tables found")
+		return
+	table_name = args.table
+	if table_name is None:
 		for table in tables:
 			print(table)
 		table_name = input("list table name: ").strip()
-		if table_name not in tables:
-			print(f"table not found: {table_name}")
-			return
-	finally:
-		db_gen.close()
+	if table_name not in tables:
+		print(f"table not found: {table_name}")
+		return
 
-	lsRecord(table_name)
+	lsRecord(table_name, args.limit, args.after)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
+import argparse
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, Integer, inspect, text
+from sqlalchemy import Boolean, DateTime, Integer, text
 
-from common.get_db import get_db
+from common.get_schema import get_columns
+from common.result_cache import cache_generation, cache_get, cache_put, capture_rows
+from common.sessionLocal import engine, read_connect, read_engine
+from Record_ls import STREAM_BATCH_SIZE, _build_select, _print_rows, _single_pk
 from Table_ls import lsTable
 
 
@@ -23,78 +27,95 @@ def _parse_value(raw_value: str, column_type):
 	return raw_value
 
 
-def _print_rows(columns, rows) -> None:
-	if not rows:
-		print("no records found")
-		return
-	print("\t".join(columns))
-	for row in rows:
-		print("\t".join("" if value is None else str(value) for value in row))
-
-
-def selectRecord(table_name: str, column_name: Optional[str], value) -> int:
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		engine = db.get_bind()
-		columns = [col["name"] for col in inspect(engine).get_columns(table_name)]
-		if not columns:
-			print(f"no columns found: {table_name}")
+def selectRecord(
+	table_name: str,
+	column_name: Optional[str],
+	value,
+	limit: Optional[int] = None,
+	after=None,
+	conn=None,
+) -> int:
+	columns = [col["name"] for col in get_columns(engine, table_name)]
+	if not columns:
+		print(f"no columns found: {table_name}")
+		return 1
+	pk_column = None
+	if limit is not None or after is not None:
+		pk_column = _single_pk(engine, table_name)
+		if pk_column is None:
+			print(f"keyset pagination requires a single-column primary key: {table_name}")
 			return 1
-		with engine.connect() as conn:
-			if column_name:
-				result = conn.execute(
-					text(f'SELECT * FROM "{table_name}" WHERE "{column_name}" = :value'),
-					{"value": value},
-				)
-			else:
-				result = conn.execute(text(f'SELECT * FROM "{table_name}"'))
-			rows = result.fetchall()
-		_print_rows(columns, rows)
-		return 0
-	finally:
-		db_gen.close()
+	query, params = _build_select(table_name, pk_column, column_name, value, limit, after)
+	cache_key = ("select", table_name, column_name, value, limit, after)
+	use_cache = conn is None
+	rows = cache_get(cache_key) if use_cache else None
+	if rows is not None:
+		count, last_pk = _print_rows(rows, columns, pk_column)
+	else:
+		captured = []
+		generation = cache_generation(table_name)
+		with read_connect(conn) as conn:
+			result = conn.execution_options(yield_per=STREAM_BATCH_SIZE).execute(text(query), params)
+			count, last_pk = _print_rows(capture_rows(result, captured) if use_cache else result, columns, pk_column)
+		if use_cache:
+			cache_put(cache_key, table_name, captured, generation, conn)
+	if limit is not None and count == limit:
+		print(f"next: --after {last_pk}")
+	return 0
 
 
 def main() -> int:
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		engine = db.get_bind()
-		tables = lsTable(engine)
-		if not tables:
-			print("no tables found")
-			return 1
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--table", help="table name")
+	parser.add_argument("--limit", type=int, help="page size")
+	parser.add_argument("--after", help="primary key value to continue after")
+	args = parser.parse_args()
+
+	tables = lsTable(read_engine())
+	if not tables:
+		print("no tables found")
+		return 1
+	table_name = args.table
+	if table_name is None:
 		for table in tables:
 			print(table)
 		table_name = input("select table name: ").strip()
-		if table_name not in tables:
-			print(f"table not found: {table_name}")
+	if table_name not in tables:
+		print(f"table not found: {table_name}")
+		return 1
+	columns = get_columns(engine, table_name)
+	if not columns:
+		print(f"no columns found: {table_name}")
+		return 1
+	column_map = {column["name"]: column["type"] for column in columns}
+	column_name = input("select column name (blank for all): ").strip()
+	if column_name == "":
+		selected_column = None
+		value = None
+	else:
+		if column_name not in column_map:
+			print(f"column not found: {column_name}")
+			return 1
+		raw_value = input(f"value for {column_name}: ").strip()
+		try:
+			value = _parse_value(raw_value, column_map[column_name])
+		except ValueError:
+			print(f"invalid value: {column_name}")
+			return 1
+		selected_column = column_name
+	after = None
+	if args.after is not None:
+		pk_column = _single_pk(engine, table_name)
+		if pk_column is None:
+			print(f"keyset pagination requires a single-column primary key: {table_name}")
 			return 1
-		columns = inspect(engine).get_columns(table_name)
-		if not columns:
-			print(f"no columns found: {table_name}")
+		try:
+			after = _parse_value(args.after, column_map[pk_column])
+		except ValueError:
+			print(f"invalid value: {pk_column}")
 			return 1
-		column_map = {column["name"]: column["type"] for column in columns}
-		column_name = input("select column name (blank for all): ").strip()
-		if column_name == "":
-			selected_column = None
-			value = None
-		else:
-			if column_name not in column_map:
-				print(f"column not found: {column_name}")
-				return 1
-			raw_value = input(f"value for {column_name}: ").strip()
-			try:
-				value = _parse_value(raw_value, column_map[column_name])
-			except ValueError:
-				print(f"invalid value: {column_name}")
-				return 1
-			selected_column = column_name
-	finally:
-		db_gen.close()
 
-	return selectRecord(table_name, selected_column, value)
+	return selectRecord(table_name, selected_column, value, args.limit, after)
 
 
 if __name__ == "__main__":
@@ -1,12 +1,21 @@
 #!/usr/bin/env python3
+import argparse
 from datetime import datetime
+from itertools import islice
+from typing import Iterable
 
-from sqlalchemy import Boolean, DateTime, Integer, inspect, text
+from sqlalchemy import Boolean, DateTime, Integer, text
 
-from common.get_db import get_db
+from common.get_schema import get_columns, get_pk_columns
+from common.result_cache import cache_generation, cache_get, cache_put, invalidate_table
+from common.sessionLocal import begin, engine, read_connect
+from Record_delete import _array_type, _coerce_row
+from Record_insert import _read_records
 from Record_ls import lsRecord
 from Table_ls import lsTable
 
+CHUNK_SIZE = 5000
+
 
 def _parse_value(raw_value: str, column_type):
 	if isinstance(column_type, Integer):
@@ -39,21 +48,30 @@ def _prompt_pk_values(columns, pk_columns) -> dict:
 	return pk_values
 
 
-def _fetch_record(engine, table_name: str, pk_values: dict):
+def _fetch_record(table_name: str, pk_values: dict, conn=None):
+	cache_key = ("fetch", table_name, tuple(sorted(pk_values.items())))
+	use_cache = conn is None
+	rows = cache_get(cache_key) if use_cache else None
+	if rows is not None:
+		return rows[0] if rows else None
 	where_clause = " AND ".join(f'"{name}" = :{name}' for name in pk_values.keys())
-	with engine.connect() as conn:
+	generation = cache_generation(table_name)
+	with read_connect(conn) as conn:
 		result = conn.execute(
 			text(f'SELECT * FROM "{table_name}" WHERE {where_clause}'),
 			pk_values,
 		)
-		return result.fetchone()
+		row = result.fetchone()
+	if use_cache:
+		cache_put(cache_key, table_name, [] if row is None else [row], generation, conn)
+	return row
 
 
 def _prompt_update_data(columns, pk_columns, row) -> dict:
 	update_data = {}
 	for column in columns:
 		name = column["name"]
-		if name in pk_columns:
+		if name in pk_columns or column.get("computed"):
 			continue
 		current_value = row._mapping.get(name)
 		if isinstance(current_value, datetime):
@@ -72,65 +90,133 @@ def _prompt_update_data(columns, pk_columns, row) -> dict:
 	return update_data
 
 
-def updateRecord(table_name: str, pk_values: dict, update_data: dict) -> int:
+def updateRecord(table_name: str, pk_values: dict, update_data: dict, conn=None) -> int:
 	if not update_data:
 		print("no update data")
 		return 1
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		engine = db.get_bind()
-		set_clause = ", ".join(f'"{name}" = :{name}' for name in update_data.keys())
-		where_clause = " AND ".join(f'"{name}" = :pk_{name}' for name in pk_values.keys())
-		params = {**update_data, **{f"pk_{k}": v for k, v in pk_values.items()}}
-		with engine.begin() as conn:
-			conn.execute(
-				text(f'UPDATE "{table_name}" SET {set_clause} WHERE {where_clause}'),
-				params,
-			)
-		print(f"updated: {table_name}")
-	finally:
-		db_gen.close()
+	set_clause = ", ".join(f'"{name}" = :{name}' for name in update_data.keys())
+	where_clause = " AND ".join(f'"{name}" = :pk_{name}' for name in pk_values.keys())
+	params = {**update_data, **{f"pk_{k}": v for k, v in pk_values.items()}}
+	with begin(conn) as conn:
+		result = conn.execute(
+			text(f'UPDATE "{table_name}" SET {set_clause} WHERE {where_clause} RETURNING 1'),
+			params,
+		)
+		if result.fetchone() is None:
+			print("record not found")
+			return 1
+		invalidate_table(table_name, conn)
+	print(f"updated: {table_name}")
 	return 0
 
 
+def _bulk_update_query(table_name: str, pk_columns, update_columns, column_map: dict):
+	names = list(pk_columns) + list(update_columns)
+	arrays = ", ".join(f"CAST(:v_{name} AS {_array_type(column_map[name])})" for name in names)
+	aliases = ", ".join(f'"{name}"' for name in names)
+	set_clause = ", ".join(f'"{name}" = v."{name}"' for name in update_columns)
+	where_clause = " AND ".join(f't."{name}" = v."{name}"' for name in pk_columns)
+	returning = ", ".join(f't."{name}"' for name in pk_columns)
+	return text(
+		f'UPDATE "{table_name}" AS t SET {set_clause} '
+		f"FROM unnest({arrays}) AS v({aliases}) "
+		f"WHERE {where_clause} RETURNING {returning}"
+	)
+
+
+def bulkUpdateRecord(
+	table_name: str,
+	update_rows: Iterable[dict],
+	chunk_size: int = CHUNK_SIZE,
+	conn=None,
+):
+	pk_columns = get_pk_columns(engine, table_name)
+	column_map = {column["name"]: column["type"] for column in get_columns(engine, table_name)}
+	queries = {}
+	updated = 0
+	missing = []
+	skipped = []
+	rows = iter(update_rows)
+	while True:
+		chunk = [_coerce_row(row, column_map) for row in islice(rows, chunk_size)]
+		if not chunk:
+			break
+		groups = {}
+		for row in chunk:
+			update_columns = tuple(name for name in column_map if name in row and name not in pk_columns)
+			groups.setdefault(update_columns, []).append(row)
+		with begin(conn) as tx:
+			for update_columns, group in groups.items():
+				keys = [tuple(row.get(name) for name in pk_columns) for row in group]
+				if not update_columns:
+					# only primary key columns given: nothing to set, which says nothing about whether the row exists
+					skipped.extend(keys)
+					continue
+				query = queries.get(update_columns)
+				if query is None:
+					query = _bulk_update_query(table_name, pk_columns, update_columns, column_map)
+					queries[update_columns] = query
+				params = {
+					f"v_{name}": [row.get(name) for row in group]
+					for name in list(pk_columns) + list(update_columns)
+				}
+				found = {tuple(row) for row in tx.execute(query, params)}
+				updated += len(found)
+				missing.extend(key for key in dict.fromkeys(keys) if key not in found)
+			invalidate_table(table_name, tx)
+	print(f"updated: {table_name} rows={updated} missing={len(missing)} skipped={len(skipped)}")
+	return updated, missing, skipped
+
+
 def main() -> int:
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		engine = db.get_bind()
-		tables = lsTable(engine)
-		if not tables:
-			print("no tables found")
-			return 1
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--file", help="CSV or JSONL file of primary keys and new values")
+	parser.add_argument("--table", help="target table name")
+	parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+	args = parser.parse_args()
+
+	tables = lsTable(engine)
+	if not tables:
+		print("no tables found")
+		return 1
+	table_name = args.table
+	if table_name is None:
 		for table in tables:
 			print(table)
 		table_name = input("update table name: ").strip()
-		if table_name not in tables:
-			print(f"table not found: {table_name}")
-			return 1
-		inspector = inspect(engine)
-		columns = inspector.get_columns(table_name)
-		if not columns:
-			print(f"no columns found: {table_name}")
-			return 1
-		pk_columns = inspector.get_pk_constraint(table_name).get("constrained_columns", [])
-		if not pk_columns:
-			print(f"no primary key found: {table_name}")
-			return 1
-		pk_values = _prompt_pk_values(columns, pk_columns)
-		if not pk_values:
-			return 1
-		row = _fetch_record(engine, table_name, pk_values)
-		if row is None:
-			print("record not found")
-			return 1
-		update_data = _prompt_update_data(columns, pk_columns, row)
-		if not update_data:
-			print("no update data")
+	if table_name not in tables:
+		print(f"table not found: {table_name}")
+		return 1
+	columns = get_columns(engine, table_name)
+	if not columns:
+		print(f"no columns found: {table_name}")
+		return 1
+	pk_columns = get_pk_columns(engine, table_name)
+	if not pk_columns:
+		print(f"no primary key found: {table_name}")
+		return 1
+	if args.file:
+		try:
+			_, missing, skipped = bulkUpdateRecord(table_name, _read_records(args.file), args.chunk_size)
+		except ValueError as exc:
+			print(exc)
 			return 1
-	finally:
-		db_gen.close()
+		for key in missing:
+			print(f"record not found: {', '.join(str(value) for value in key)}")
+		for key in skipped:
+			print(f"no columns to update: {', '.join(str(value) for value in key)}")
+		return 0
+	pk_values = _prompt_pk_values(columns, pk_columns)
+	if not pk_values:
+		return 1
+	row = _fetch_record(table_name, pk_values)
+	if row is None:
+		print("record not found")
+		return 1
+	update_data = _prompt_update_data(columns, pk_columns, row)
+	if not update_data:
+		print("no update data")
+		return 1
 
 	updateRecord(table_name, pk_values, update_data)
 	lsRecord(table_name)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+import argparse
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+
+from common.get_schema import get_indexes, get_pk_columns
+from common.result_cache import invalidate_table
+from common.sessionLocal import begin, engine
+from Record_delete import _array_type
+from Record_insert import _coerce_record, _get_columns, _group_rows, _read_records
+from Table_ls import lsTable
+
+BATCH_SIZE = 5000
+TIMESTAMP_COLUMNS = ("created_at", "updated_at")
+
+
+def _unique_keys(engine, table_name: str) -> list:
+	keys = []
+	for index in get_indexes(engine, table_name):
+		if not index.get("unique") or index.get("dialect_options", {}).get("postgresql_where"):
+			continue
+		column_names = index.get("column_names") or []
+		if column_names and None not in column_names:
+			keys.append(tuple(column_names))
+	pk_columns = get_pk_columns(engine, table_name)
+	if pk_columns:
+		keys.append(tuple(pk_columns))
+	return keys
+
+
+def _conflict_key(unique_keys: list, names, key: Optional[list]):
+	if key is not None:
+		for unique_key in unique_keys:
+			if set(unique_key) == set(key):
+				return unique_key
+		raise ValueError(f"no unique constraint on: {', '.join(key)}")
+	for unique_key in unique_keys:
+		if set(unique_key) <= set(names):
+			return unique_key
+	raise ValueError("rows do not cover any unique constraint")
+
+
+def _upsert_query(table_name: str, names: list, key_columns, column_map: dict):
+	columns = ", ".join(f'"{name}"' for name in names)
+	arrays = ", ".join(f"CAST(:v_{name} AS {_array_type(column_map[name]['type'])})" for name in names)
+	conflict = ", ".join(f'"{name}"' for name in key_columns)
+	update_columns = [name for name in names if name not in key_columns and name != "created_at"]
+	compare_columns = [name for name in update_columns if name not in TIMESTAMP_COLUMNS]
+	if compare_columns:
+		set_clause = ", ".join(f'"{name}" = EXCLUDED."{name}"' for name in update_columns)
+		current = ", ".join(f't."{name}"' for name in compare_columns)
+		incoming = ", ".join(f'EXCLUDED."{name}"' for name in compare_columns)
+		action = f"DO UPDATE SET {set_clause} WHERE ({current}) IS DISTINCT FROM ({incoming})"
+	else:
+		action = "DO NOTHING"
+	return text(
+		f'INSERT INTO "{table_name}" AS t ({columns}) SELECT * FROM unnest({arrays}) '
+		f"ON CONFLICT ({conflict}) {action} RETURNING (xmax = 0)"
+	)
+
+
+def _dedupe(batch: list, key_columns) -> list:
+	rows = {}
+	for index, row in enumerate(batch):
+		key = tuple(row.get(name) for name in key_columns)
+		rows[index if None in key else key] = row
+	return list(rows.values())
+
+
+def upsertRecord(
+	table_name: str,
+	records: Iterable[dict],
+	key: Optional[list] = None,
+	batch_size: int = BATCH_SIZE,
+	conn=None,
+) -> dict:
+	columns, pk_columns = _get_columns(engine, table_name)
+	if not columns:
+		raise ValueError(f"no columns found: {table_name}")
+	column_map = {column["name"]: column for column in columns}
+	unique_keys = _unique_keys(engine, table_name)
+	default_timestamp = datetime.utcnow()
+	rows = (_coerce_record(record, column_map, pk_columns, default_timestamp) for record in records)
+	counts = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0}
+	queries = {}
+	started = time.perf_counter()
+	while True:
+		batch = list(islice(rows, batch_size))
+		if not batch:
+			break
+		with begin(conn) as tx:
+			for names, group in _group_rows(columns, batch):
+				query = queries.get(names)
+				if query is None:
+					key_columns = _conflict_key(unique_keys, names, key)
+					query = (key_columns, _upsert_query(table_name, list(names), key_columns, column_map))
+					queries[names] = query
+				key_columns, statement = query
+				merged = _dedupe(group, key_columns)
+				params = {f"v_{name}": [row[name] for row in merged] for name in names}
+				results = [row[0] for row in tx.execute(statement, params)]
+				if results:
+					invalidate_table(table_name, tx)
+				inserted = sum(1 for value in results if value)
+				counts["inserted"] += inserted
+				counts["updated"] += len(results) - inserted
+				counts["unchanged"] += len(merged) - len(results)
+				counts["duplicates"] += len(group) - len(merged)
+	elapsed = time.perf_counter() - started
+	print(
+		f"upserted: {table_name} inserted={counts['inserted']} updated={counts['updated']} "
+		f"unchanged={counts['unchanged']} duplicates={counts['duplicates']} elapsed={elapsed:.2f}s"
+	)
+	return counts
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--file", required=True, help="CSV or JSONL file to merge")
+	parser.add_argument("--table", required=True, help="target table name")
+	parser.add_argument("--key", help="comma-separated unique key columns (default: first one the rows cover)")
+	parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+	args = parser.parse_args()
+
+	if args.table not in lsTable(engine):
+		print(f"table not found: {args.table}")
+		return 1
+	key = args.key.split(",") if args.key else None
+	try:
+		upsertRecord(args.table, _read_records(args.file), key, args.batch_size)
+	except ValueError as exc:
+		print(exc)
+		return 1
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from common.get_schema import get_columns, get_pk_columns
+from common.result_cache import invalidate_table
+from common.sessionLocal import begin, engine
+
+CHUNK_SIZE = 5000
+LOCK_TIMEOUT_MS = 5000
+LOCK_NOT_AVAILABLE = "55P03"
+
+ARCHIVES = {
+	"messages": {
+		"table": "messages",
+		"order": ("created_at", "id"),
+		"filter": 't."created_at" < :cutoff',
+		"children": [],
+	},
+	"rooms": {
+		"table": "chat_rooms",
+		"order": ("updated_at", "id"),
+		"filter": (
+			't."updated_at" < :cutoff '
+			'AND NOT EXISTS (SELECT 1 FROM "messages" m WHERE m."room_id" = t."id")'
+		),
+		"children": [("chat_members", "room_id")],
+	},
+}
+
+
+def _archive_columns(table_name: str) -> list:
+	return [column["name"] for column in get_columns(engine, table_name) if not column.get("computed")]
+
+
+def _ensure_archive_tables(spec: dict) -> None:
+	with begin() as conn:
+		for table_name in [spec["table"]] + [child for child, _ in spec["children"]]:
+			conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{table_name}_archive" (LIKE "{table_name}")'))
+
+
+def _chunk_query(spec: dict, to_file: bool, resume: bool):
+	table_name = spec["table"]
+	order = spec["order"]
+	column_map = {column["name"]: column["type"] for column in get_columns(engine, table_name)}
+	pk_columns = get_pk_columns(engine, table_name)
+	key_columns = list(dict.fromkeys(list(pk_columns) + list(order)))
+	selected = ", ".join(f't."{name}"' for name in key_columns)
+	ordering = ", ".join(f't."{name}"' for name in order)
+	where = spec["filter"]
+	if resume:
+		after = ", ".join(
+			f"CAST(:after_{i} AS {column_map[name].compile(dialect=engine.dialect)})"
+			for i, name in enumerate(order)
+		)
+		where += f" AND ({ordering}) > ({after})"
+	join = " AND ".join(f't."{name}" = d."{name}"' for name in pk_columns)
+	# plain FOR UPDATE: skipping locked rows would leave them behind the advancing checkpoint for good
+	ctes = [
+		f'doomed AS (SELECT {selected} FROM "{table_name}" t WHERE {where} '
+		f"ORDER BY {ordering} LIMIT :chunk_size FOR UPDATE)",
+	]
+	outputs = []
+	for child, foreign_key in spec["children"]:
+		ctes.append(
+			f'"{child}_moved" AS (DELETE FROM "{child}" c USING doomed d '
+			f'WHERE c."{foreign_key}" = d."id" RETURNING c.*)'
+		)
+		outputs.append(child)
+	ctes.append(f'moved AS (DELETE FROM "{table_name}" t USING doomed d WHERE {join} RETURNING t.*)')
+	if to_file:
+		selects = [f"SELECT '{table_name}', row_to_json(x)::text FROM moved x"] + [
+			f"SELECT '{child}', row_to_json(x)::text FROM \"{child}_moved\" x" for child in outputs
+		]
+		return text(f"WITH {', '.join(ctes)} " + " UNION ALL ".join(selects))
+	for index, source in enumerate(outputs + [table_name]):
+		columns = ", ".join(f'"{name}"' for name in _archive_columns(source))
+		moved = "moved" if source == table_name else f'"{source}_moved"'
+		ctes.append(f'archived_{index} AS (INSERT INTO "{source}_archive" ({columns}) SELECT {columns} FROM {moved})')
+	last = ", ".join(f'"{name}"' for name in order)
+	latest = ", ".join(f'"{name}" DESC' for name in order)
+	return text(
+		f"WITH {', '.join(ctes)} "
+		f"SELECT (SELECT count(*) FROM moved), {last} FROM moved ORDER BY {latest} LIMIT 1"
+	)
+
+
+def _load_checkpoint(path: str) -> Optional[dict]:
+	if not path or not os.path.exists(path):
+		return None
+	with open(path, encoding="utf-8") as f:
+		return json.load(f)
+
+
+def _save_checkpoint(path: str, checkpoint: dict) -> None:
+	tmp_path = f"{path}.tmp"
+	with open(tmp_path, "w", encoding="utf-8") as f:
+		json.dump(checkpoint, f, default=str)
+	os.replace(tmp_path, path)
+
+
+def _archive_chunk(spec: dict, output: Optional[str], query, params: dict):
+	table_name = spec["table"]
+	after = None
+	with begin() as tx:
+		tx.execute(text(f"SET LOCAL lock_timeout = {LOCK_TIMEOUT_MS}"))
+		rows = tx.execute(query, params).fetchall()
+		if output is not None:
+			parents = [json.loads(row[1]) for row in rows if row[0] == table_name]
+			count = len(parents)
+			if parents:
+				with gzip.open(output, "at", encoding="utf-8") as f:
+					for source, row in rows:
+						f.write(json.dumps({"table": source, "row": json.loads(row)}) + "\n")
+					f.flush()
+					os.fsync(f.fileno())
+				last = max(parents, key=lambda row: tuple(row[column] for column in spec["order"]))
+				after = [last[column] for column in spec["order"]]
+		else:
+			count = rows[0][0] if rows else 0
+			if count:
+				after = list(rows[0][1:])
+		if count:
+			invalidate_table(table_name, tx)
+			for child, _ in spec["children"]:
+				invalidate_table(child, tx)
+	return count, after
+
+
+def archiveRecords(
+	name: str,
+	cutoff: datetime,
+	output: Optional[str] = None,
+	chunk_size: int = CHUNK_SIZE,
+	rate: float = 0.0,
+	pause: float = 0.0,
+	checkpoint_path: Optional[str] = None,
+) -> int:
+	spec = ARCHIVES[name]
+	table_name = spec["table"]
+	target = output or f"{table_name}_archive"
+	checkpoint = _load_checkpoint(checkpoint_path)
+	resumable = checkpoint is not None and checkpoint["archive"] == name and checkpoint["target"] == target
+	if resumable and checkpoint["cutoff"] != cutoff.isoformat():
+		# the keyset position only holds for the cutoff it was taken under; rows already moved stay moved
+		print(f"checkpoint cutoff {checkpoint['cutoff']} differs from {cutoff.isoformat()}; starting over")
+		resumable = False
+	if resumable:
+		print(f"resuming: {name} moved={checkpoint['moved']} after={checkpoint['after']}")
+	else:
+		checkpoint = {"archive": name, "target": target, "cutoff": cutoff.isoformat(), "after": None, "moved": 0}
+	if output is None:
+		_ensure_archive_tables(spec)
+	queries = {}
+	started = time.perf_counter()
+	moved = 0
+	while True:
+		resume = checkpoint["after"] is not None
+		query = queries.get(resume)
+		if query is None:
+			query = queries[resume] = _chunk_query(spec, output is not None, resume)
+		params = {"cutoff": cutoff, "chunk_size": chunk_size}
+		if resume:
+			params.update({f"after_{i}": value for i, value in enumerate(checkpoint["after"])})
+		try:
+			count, after = _archive_chunk(spec, output, query, params)
+		except OperationalError as exc:
+			if getattr(exc.orig, "pgcode", None) != LOCK_NOT_AVAILABLE:
+				raise
+			print(f"rows locked: {name}; retrying chunk")
+			time.sleep(max(pause, 1.0))
+			continue
+		if not count:
+			break
+		moved += count
+		checkpoint["after"] = after
+		checkpoint["moved"] += count
+		if checkpoint_path:
+			_save_checkpoint(checkpoint_path, checkpoint)
+		elapsed = time.perf_counter() - started
+		delay = pause
+		if rate > 0:
+			delay = max(delay, moved / rate - elapsed)
+		print(f"archived: {name} chunk={count} total={checkpoint['moved']} rate={moved / elapsed:.0f} rows/s")
+		if delay > 0:
+			time.sleep(delay)
+	if checkpoint_path and os.path.exists(checkpoint_path):
+		os.remove(checkpoint_path)
+	elapsed = time.perf_counter() - started
+	print(f"archived: {name} rows={checkpoint['moved']} into={target} elapsed={elapsed:.2f}s")
+	return moved
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("archive", choices=sorted(ARCHIVES), help="what to archive")
+	cutoff_group = parser.add_mutually_exclusive_group(required=True)
+	cutoff_group.add_argument("--before", help="archive rows older than this timestamp")
+	cutoff_group.add_argument("--older-than-days", type=int, help="archive rows older than N days")
+	parser.add_argument("--output", help="gzip JSONL file instead of the <table>_archive table")
+	parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+	parser.add_argument("--rate", type=float, default=0.0, help="max rows per second (0 for unlimited)")
+	parser.add_argument("--sleep", type=float, default=0.0, help="seconds to pause between chunks")
+	parser.add_argument("--checkpoint", help="checkpoint file (default: archive_<name>.checkpoint.json)")
+	args = parser.parse_args()
+
+	if args.before:
+		try:
+			cutoff = datetime.fromisoformat(args.before)
+		except ValueError:
+			print(f"invalid timestamp: {args.before}")
+			return 1
+	else:
+		cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+	checkpoint = args.checkpoint or f"archive_{args.archive}.checkpoint.json"
+	archiveRecords(args.archive, cutoff, args.output, args.chunk_size, args.rate, args.sleep, checkpoint)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -1,15 +1,15 @@
 #!/usr/bin/env python3
-from common.get_db import get_db
+from common.get_schema import invalidate_schema
+from common.sessionLocal import engine
 from common import models
+from Table_partition import createPartitions
 
 
 def main() -> None:
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		models.Base.metadata.create_all(bind=db.get_bind())
-	finally:
-		db_gen.close()
+	models.Base.metadata.create_all(bind=engine)
+	invalidate_schema(engine)
+	if models.MESSAGES_PARTITIONED:
+		createPartitions()
 
 
 if __name__ == "__main__":
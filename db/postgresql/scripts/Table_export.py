@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, text
+
+from common.get_schema import get_columns, get_pk_columns
+from common.sessionLocal import engine
+from Table_ls import lsTable
+
+FORMATS = ("csv", "jsonl", "parquet")
+ROW_GROUP_SIZE = 100000
+
+
+class _HashingWriter:
+	def __init__(self, f):
+		self._f = f
+		self.sha256 = hashlib.sha256()
+		self.bytes = 0
+
+	def write(self, data):
+		if isinstance(data, str):
+			data = data.encode("utf-8")
+		self.sha256.update(data)
+		self.bytes += len(data)
+		return self._f.write(data)
+
+
+def _column_kind(column_type) -> str:
+	if isinstance(column_type, Boolean):
+		return "bool"
+	if isinstance(column_type, Integer):
+		return "int"
+	if isinstance(column_type, Float):
+		return "float"
+	if isinstance(column_type, DateTime):
+		return "timestamp"
+	return "string"
+
+
+def _part_ranges(conn, table_name: str, pk_column, parts: int) -> list:
+	if pk_column is None or parts <= 1:
+		return [None]
+	low, high = conn.execute(text(f'SELECT min("{pk_column}"), max("{pk_column}") FROM "{table_name}"')).one()
+	if low is None:
+		return [None]
+	step = max(1, -(-(high - low + 1) // parts))
+	return [(start, min(start + step, high + 1)) for start in range(low, high + 1, step)]
+
+
+def _plan(conn, table_names: list, output_dir: str, fmt: str, parts: int, snapshot: str) -> list:
+	tasks = []
+	for table_name in table_names:
+		columns = [(column["name"], _column_kind(column["type"])) for column in get_columns(engine, table_name)]
+		pk_columns = get_pk_columns(engine, table_name)
+		pk_column = None
+		if len(pk_columns) == 1 and dict(columns)[pk_columns[0]] == "int":
+			pk_column = pk_columns[0]
+		ranges = _part_ranges(conn, table_name, pk_column, parts)
+		for index, pk_range in enumerate(ranges):
+			suffix = f".part{index:04d}" if len(ranges) > 1 else ""
+			tasks.append({
+				"table": table_name,
+				"part": index,
+				"path": os.path.join(output_dir, f"{table_name}{suffix}.{fmt}"),
+				"format": fmt,
+				"columns": columns,
+				"pk_column": pk_column,
+				"range": pk_range,
+				"snapshot": snapshot,
+			})
+	return tasks
+
+
+def _select_sql(task: dict) -> str:
+	columns = ", ".join(f'"{name}"' for name, _ in task["columns"])
+	query = f'SELECT {columns} FROM "{task["table"]}"'
+	if task["range"] is not None:
+		low, high = task["range"]
+		pk_column = task["pk_column"]
+		query += f' WHERE "{pk_column}" >= {int(low)} AND "{pk_column}" < {int(high)}'
+	return query
+
+
+def _copy_part(raw, task: dict) -> dict:
+	query = _select_sql(task)
+	if task["format"] == "csv":
+		copy_sql = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+	else:
+		copy_sql = (
+			f"COPY (SELECT row_to_json(t) FROM ({query}) AS t) TO STDOUT "
+			"WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+		)
+	cursor = raw.cursor()
+	try:
+		with open(task["path"], "wb") as f:
+			writer = _HashingWriter(f)
+			cursor.copy_expert(copy_sql, writer)
+		rows = cursor.rowcount
+	finally:
+		cursor.close()
+	return {"rows": rows, "bytes": writer.bytes, "sha256": writer.sha256.hexdigest()}
+
+
+def _parquet_part(raw, task: dict) -> dict:
+	import pyarrow as pa
+	import pyarrow.parquet as pq
+
+	kinds = {
+		"bool": pa.bool_(),
+		"int": pa.int64(),
+		"float": pa.float64(),
+		"timestamp": pa.timestamp("us"),
+		"string": pa.string(),
+	}
+	schema = pa.schema([(name, kinds[kind]) for name, kind in task["columns"]])
+	names = [name for name, _ in task["columns"]]
+	rows = 0
+	cursor = raw.cursor(name=f"export_{task['table']}_{task['part']}")
+	cursor.itersize = ROW_GROUP_SIZE
+	try:
+		cursor.execute(_select_sql(task))
+		with pq.ParquetWriter(task["path"], schema) as writer:
+			while True:
+				batch = cursor.fetchmany(ROW_GROUP_SIZE)
+				if not batch:
+					break
+				columns = list(zip(*batch))
+				writer.write_table(pa.Table.from_arrays(
+					[pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+					names=names,
+				))
+				rows += len(batch)
+	finally:
+		cursor.close()
+	sha256 = hashlib.sha256()
+	with open(task["path"], "rb") as f:
+		for chunk in iter(lambda: f.read(1 << 20), b""):
+			sha256.update(chunk)
+	return {"rows": rows, "bytes": os.path.getsize(task["path"]), "sha256": sha256.hexdigest()}
+
+
+def _init_worker() -> None:
+	engine.dispose(close=False)
+
+
+def _export_part(task: dict) -> dict:
+	started = time.perf_counter()
+	raw = engine.raw_connection()
+	try:
+		cursor = raw.cursor()
+		try:
+			# every part reads the coordinator's exported snapshot, so all tables and parts see one point in time
+			cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+			cursor.execute("SET TRANSACTION SNAPSHOT %s", (task["snapshot"],))
+		finally:
+			cursor.close()
+		if task["format"] == "parquet":
+			result = _parquet_part(raw, task)
+		else:
+			result = _copy_part(raw, task)
+		raw.commit()
+	finally:
+		raw.close()
+	return {
+		"table": task["table"],
+		"part": task["part"],
+		"path": os.path.basename(task["path"]),
+		"range": task["range"],
+		**result,
+		"elapsed": round(time.perf_counter() - started, 3),
+	}
+
+
+def exportTable(table_names: list, output_dir: str, fmt: str = "csv", workers: int = 4, parts: int = 1) -> dict:
+	if fmt not in FORMATS:
+		raise ValueError(f"invalid format: {fmt}")
+	if fmt == "parquet":
+		try:
+			import pyarrow.parquet  # noqa: F401
+		except ImportError:
+			raise ValueError("parquet export requires pyarrow") from None
+	os.makedirs(output_dir, exist_ok=True)
+	started = time.perf_counter()
+	# the exported snapshot stays importable only while this transaction is open
+	with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+		with conn.begin():
+			snapshot = conn.execute(text("SELECT pg_export_snapshot()")).scalar()
+			tasks = _plan(conn, table_names, output_dir, fmt, parts, snapshot)
+			# spawn, not fork: a forked worker would inherit the open snapshot connection and could close it on exit
+			context = multiprocessing.get_context("spawn")
+			with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as executor:
+				files = list(executor.map(_export_part, tasks))
+	manifest = {
+		"created_at": datetime.utcnow().isoformat(timespec="seconds"),
+		"format": fmt,
+		"elapsed": round(time.perf_counter() - started, 3),
+		"tables": {
+			table_name: sum(item["rows"] for item in files if item["table"] == table_name)
+			for table_name in table_names
+		},
+		"files": files,
+	}
+	with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+		json.dump(manifest, f, indent=2)
+	for table_name, rows in manifest["tables"].items():
+		print(f"exported: {table_name} rows={rows}")
+	return manifest
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("tables", nargs="*", help="tables to export (default: all)")
+	parser.add_argument("--output", required=True, help="output directory")
+	parser.add_argument("--format", choices=FORMATS, default="csv")
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+	parser.add_argument("--parts", type=int, default=1, help="split each table into N primary key ranges")
+	args = parser.parse_args()
+
+	tables = lsTable(engine)
+	table_names = args.tables or tables
+	for table_name in table_names:
+		if table_name not in tables:
+			print(f"table not found: {table_name}")
+			return 1
+	try:
+		exportTable(table_names, args.output, args.format, args.workers, args.parts)
+	except ValueError as exc:
+		print(exc)
+		return 1
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -1,32 +1,22 @@
 #!/usr/bin/env python3
 import sys
 
-from sqlalchemy import inspect
-
-from common.get_db import get_db
+from common.get_schema import get_table_names
+from common.sessionLocal import read_engine
 
 
 def lsTable(engine):
-	inspector = inspect(engine)
-	tables = inspector.get_table_names()
-	return tables
+	return list(get_table_names(engine))
 
 def main() -> int:
-	db_gen = get_db()
-	db = next(db_gen)
-	try:
-		engine = db.get_bind()
-		tables = lsTable(engine)
-		if not tables:
-			print("tables are nothing")
-			return 0
-		else:
-			for table in tables:
-				print(table)
-			return 0
-
-	finally:
-		db_gen.close()
+	tables = lsTable(read_engine())
+	if not tables:
+		print("tables are nothing")
+		return 0
+	else:
+		for table in tables:
+			print(table)
+		return 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+import argparse
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from common import models
+from common.get_schema import invalidate_schema
+from common.member_counters import installed_features
+from common.sessionLocal import begin, engine
+from Member_inbox import check_last_message_pointers
+from Member_unread import check_unread_counters
+
+PARENT_TABLE = "messages"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+UNPARTITIONED_TABLE = f"{PARENT_TABLE}_unpartitioned"
+UPCOMING_MONTHS = 3
+
+
+def _month_start(value: date) -> date:
+	return date(value.year, value.month, 1)
+
+
+def _add_months(value: date, months: int) -> date:
+	index = value.year * 12 + value.month - 1 + months
+	return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+	return f"{PARENT_TABLE}_p{month:%Y%m}"
+
+
+def _partition_month(name: str) -> Optional[date]:
+	prefix = f"{PARENT_TABLE}_p"
+	if not name.startswith(prefix):
+		return None
+	try:
+		return datetime.strptime(name[len(prefix):], "%Y%m").date()
+	except ValueError:
+		return None
+
+
+def _is_partitioned(conn) -> bool:
+	relkind = conn.execute(
+		text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table_name)"),
+		{"table_name": PARENT_TABLE},
+	).scalar()
+	return relkind == "p"
+
+
+def lsPartition(conn) -> list:
+	rows = conn.execute(
+		text(
+			"SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+			"WHERE i.inhparent = to_regclass(:table_name) ORDER BY c.relname"
+		),
+		{"table_name": PARENT_TABLE},
+	)
+	return [row[0] for row in rows]
+
+
+def _default_rows(conn) -> int:
+	return conn.execute(text(f'SELECT count(*) FROM "{DEFAULT_PARTITION}"')).scalar()
+
+
+def _create_partition(conn, name: str, month: date, has_default: bool) -> int:
+	bounds = f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+	if not has_default:
+		conn.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{PARENT_TABLE}" {bounds}'))
+		return 0
+	# rows of this month already in DEFAULT would make PARTITION OF fail, so they move into the new table first
+	conn.execute(text(f'LOCK TABLE "{DEFAULT_PARTITION}" IN ACCESS EXCLUSIVE MODE'))
+	params = {"first": month, "last": _add_months(month, 1)}
+	in_range = '"created_at" >= :first AND "created_at" < :last'
+	if not conn.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE {in_range})'), params).scalar():
+		conn.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{PARENT_TABLE}" {bounds}'))
+		return 0
+	columns = ", ".join(f'"{column.name}"' for column in models.Message.__table__.columns if column.computed is None)
+	conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{PARENT_TABLE}" INCLUDING DEFAULTS INCLUDING GENERATED)'))
+	moved = conn.execute(
+		text(
+			f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range} RETURNING {columns}) '
+			f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM moved'
+		),
+		params,
+	).rowcount
+	conn.execute(text(f'ALTER TABLE "{PARENT_TABLE}" ATTACH PARTITION "{name}" {bounds}'))
+	return moved
+
+
+def createPartitions(start: Optional[date] = None, months: int = UPCOMING_MONTHS, conn=None) -> list:
+	first = _month_start(start or datetime.utcnow().date())
+	last = _add_months(_month_start(datetime.utcnow().date()), months)
+	created = []
+	with begin(conn) as conn:
+		if not _is_partitioned(conn):
+			print(f"table is not partitioned: {PARENT_TABLE}")
+			return created
+		existing = set(lsPartition(conn))
+		has_default = DEFAULT_PARTITION in existing
+		month = first
+		while month <= last:
+			name = _partition_name(month)
+			if name not in existing:
+				moved = _create_partition(conn, name, month, has_default)
+				if moved:
+					print(f"moved: {DEFAULT_PARTITION} -> {name} rows={moved}")
+				created.append(name)
+			month = _add_months(month, 1)
+		if has_default:
+			stray = _default_rows(conn)
+			if stray:
+				print(f"warning: {DEFAULT_PARTITION} holds {stray} rows outside the monthly partitions; "
+					"run create --start with an earlier month to move them")
+		else:
+			conn.execute(text(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{PARENT_TABLE}" DEFAULT'))
+			created.append(DEFAULT_PARTITION)
+	if created:
+		invalidate_schema(engine)
+	for name in created:
+		print(f"created: {name}")
+	return created
+
+
+def _rebuild_member_counters(conn) -> None:
+	# dropped partitions and deletes aimed at one partition bypass the statement triggers on messages
+	features = installed_features(conn)
+	if "unread" in features:
+		check_unread_counters(rebuild=True, conn=conn)
+	if "activity" in features:
+		check_last_message_pointers(rebuild=True, conn=conn)
+
+
+def dropPartitions(keep_months: int) -> list:
+	cutoff = _add_months(_month_start(datetime.utcnow().date()), -keep_months)
+	dropped = []
+	dropped_rows = False
+	with engine.begin() as conn:
+		if not _is_partitioned(conn):
+			print(f"table is not partitioned: {PARENT_TABLE}")
+			return dropped
+		for name in lsPartition(conn):
+			month = _partition_month(name)
+			if month is None or _add_months(month, 1) > cutoff:
+				continue
+			conn.execute(text(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{name}"'))
+			conn.execute(text(f'DROP TABLE "{name}"'))
+			dropped.append(name)
+		if DEFAULT_PARTITION in lsPartition(conn):
+			# rows that landed in DEFAULT have no partition to drop, so expired ones are deleted instead
+			deleted = conn.execute(
+				text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE "created_at" < :cutoff'),
+				{"cutoff": cutoff},
+			).rowcount
+			if deleted:
+				print(f"deleted: {DEFAULT_PARTITION} rows={deleted}")
+				dropped_rows = True
+		if dropped or dropped_rows:
+			_rebuild_member_counters(conn)
+	if dropped:
+		invalidate_schema(engine)
+	for name in dropped:
+		print(f"dropped: {name}")
+	return dropped
+
+
+def _rename_indexes(conn, table_name: str, suffix: str) -> None:
+	names = conn.execute(
+		text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table_name"),
+		{"table_name": table_name},
+	).scalars().all()
+	for name in names:
+		conn.execute(text(f'ALTER INDEX "{name}" RENAME TO "{(name + suffix)[:63]}"'))
+
+
+def migrateTable(conn=None) -> int:
+	if not models.MESSAGES_PARTITIONED:
+		print("set MESSAGES_PARTITIONED=true so the messages model is partitioned before migrating")
+		return 0
+	with begin(conn) as conn:
+		if _is_partitioned(conn):
+			print(f"table is already partitioned: {PARENT_TABLE}")
+			return 0
+		if conn.execute(text("SELECT to_regclass(:table_name)"), {"table_name": UNPARTITIONED_TABLE}).scalar():
+			print(f"table already exists: {UNPARTITIONED_TABLE}")
+			return 0
+		conn.execute(text(f'LOCK TABLE "{PARENT_TABLE}" IN ACCESS EXCLUSIVE MODE'))
+		sequence = conn.execute(text(f"SELECT pg_get_serial_sequence('\"{PARENT_TABLE}\"', 'id')")).scalar()
+		conn.execute(text(f'ALTER TABLE "{PARENT_TABLE}" RENAME TO "{UNPARTITIONED_TABLE}"'))
+		_rename_indexes(conn, UNPARTITIONED_TABLE, "_unpartitioned")
+		if sequence is not None:
+			conn.execute(text(f'ALTER SEQUENCE {sequence} RENAME TO "{UNPARTITIONED_TABLE}_id_seq"'))
+		models.Message.__table__.create(conn)
+		oldest = conn.execute(text(f'SELECT min("created_at") FROM "{UNPARTITIONED_TABLE}"')).scalar()
+		createPartitions(oldest.date() if oldest is not None else None, conn=conn)
+		columns = ", ".join(f'"{column.name}"' for column in models.Message.__table__.columns if column.computed is None)
+		copied = conn.execute(
+			text(f'INSERT INTO "{PARENT_TABLE}" ({columns}) SELECT {columns} FROM "{UNPARTITIONED_TABLE}"')
+		).rowcount
+		conn.execute(
+			text(
+				f"SELECT setval(pg_get_serial_sequence('\"{PARENT_TABLE}\"', 'id'), "
+				f'(SELECT COALESCE(max("id"), 0) + 1 FROM "{PARENT_TABLE}"), false)'
+			)
+		)
+	invalidate_schema(engine)
+	print(f"migrated: {PARENT_TABLE} rows={copied}")
+	print(f"triggers stay on {UNPARTITIONED_TABLE}; re-run Member_unread.py install and Member_inbox.py install, "
+		f"then drop {UNPARTITIONED_TABLE} once verified")
+	return copied
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	subparsers = parser.add_subparsers(dest="command", required=True)
+	subparsers.add_parser("ls", help="list partitions of the messages table")
+	create_parser = subparsers.add_parser("create", help="create monthly partitions up to N months ahead")
+	create_parser.add_argument("--months", type=int, default=UPCOMING_MONTHS)
+	create_parser.add_argument("--start", help="first month to create (YYYY-MM-DD)")
+	retain_parser = subparsers.add_parser("retain", help="detach and drop partitions older than N months")
+	retain_parser.add_argument("--keep-months", type=int, required=True)
+	subparsers.add_parser(
+		"migrate", help="copy an existing unpartitioned messages table into a partitioned one (needs MESSAGES_PARTITIONED=true)"
+	)
+	args = parser.parse_args()
+
+	if args.command == "ls":
+		with engine.connect() as conn:
+			partitions = lsPartition(conn)
+		if not partitions:
+			print("partitions are nothing")
+		for name in partitions:
+			print(name)
+		return 0
+	if args.command == "create":
+		start = date.fromisoformat(args.start) if args.start else None
+		createPartitions(start, args.months)
+		return 0
+	if args.command == "migrate":
+		migrateTable()
+		return 0
+	if args.keep_months < 1:
+		print("keep months must be at least 1")
+		return 1
+	partitions = dropPartitions(args.keep_months)
+	if not partitions:
+		print("no partitions to drop")
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from common import models
+from common.copy_csv import copy_rows
+from common.sessionLocal import engine
+from Table_partition import createPartitions
+
+WORDS = (
+	"hello thanks sure okay meeting tomorrow today lunch deploy review merge build test "
+	"ship bug fix issue please check call later morning evening weekend coffee update done"
+).split()
+HASHED_PASSWORD = "$2b$12$seededseededseededseededseededseededseededseededseede"
+CHUNK_ROWS = 50000
+COPY_ROWS = 10000
+
+USER_COLUMNS = ["id", "email", "hashed_password", "is_active", "is_superuser", "created_at", "updated_at"]
+ROOM_COLUMNS = ["id", "name", "is_direct", "created_at", "updated_at"]
+MEMBER_COLUMNS = ["id", "room_id", "user_id", "role", "joined_at", "last_read_at"]
+MESSAGE_COLUMNS = ["id", "room_id", "sender_id", "body", "is_system", "created_at", "updated_at"]
+
+
+def _rng(seed: int, phase: str, index: int) -> random.Random:
+	return random.Random(f"{seed}:{phase}:{index}")
+
+
+def _room_members(config: dict, room_index: int) -> list:
+	rng = _rng(config["seed"], "members", room_index)
+	size = config["room_sizes"][room_index]
+	return [config["user_base"] + i + 1 for i in rng.sample(range(config["users"]), size)]
+
+
+def _timestamp(config: dict, rng: random.Random) -> datetime:
+	return config["start"] + timedelta(seconds=rng.random() * config["span"])
+
+
+def _user_rows(config: dict, first: int, last: int):
+	rng = _rng(config["seed"], "users", first)
+	for index in range(first, last):
+		user_id = config["user_base"] + index + 1
+		created_at = _timestamp(config, rng)
+		yield (user_id, f"user{user_id}@example.com", HASHED_PASSWORD, rng.random() > 0.05, False, created_at, created_at)
+
+
+def _room_rows(config: dict, first: int, last: int):
+	for index in range(first, last):
+		room_id = config["room_base"] + index + 1
+		is_direct = config["room_sizes"][index] == 2
+		yield (room_id, f"room {room_id}", is_direct, config["start"], config["start"])
+
+
+def _member_rows(config: dict, first: int, last: int):
+	member_id = config["member_base"] + sum(config["room_sizes"][:first])
+	for index in range(first, last):
+		rng = _rng(config["seed"], "last_read", index)
+		room_id = config["room_base"] + index + 1
+		for position, user_id in enumerate(_room_members(config, index)):
+			member_id += 1
+			role = "owner" if position == 0 else "member"
+			last_read_at = _timestamp(config, rng) if rng.random() < 0.8 else None
+			yield (member_id, room_id, user_id, role, config["start"], last_read_at)
+
+
+def _message_rows(config: dict, first: int, last: int):
+	message_id = config["message_base"] + sum(config["message_counts"][:first])
+	for index in range(first, last):
+		count = config["message_counts"][index]
+		if count == 0:
+			continue
+		rng = _rng(config["seed"], "messages", index)
+		room_id = config["room_base"] + index + 1
+		members = _room_members(config, index)
+		for created_at in sorted(_timestamp(config, rng) for _ in range(count)):
+			message_id += 1
+			body = " ".join(rng.choices(WORDS, k=rng.randint(3, 20)))
+			yield (message_id, room_id, rng.choice(members), body, False, created_at, created_at)
+
+
+PHASES = {
+	"users": ("users", USER_COLUMNS, _user_rows),
+	"chat_rooms": ("chat_rooms", ROOM_COLUMNS, _room_rows),
+	"chat_members": ("chat_members", MEMBER_COLUMNS, _member_rows),
+	"messages": ("messages", MESSAGE_COLUMNS, _message_rows),
+}
+
+
+def _init_worker() -> None:
+	engine.dispose(close=False)
+
+
+def _seed_chunk(task) -> int:
+	phase, config, first, last = task
+	table_name, columns, generate = PHASES[phase]
+	raw = engine.raw_connection()
+	total = 0
+	try:
+		cursor = raw.cursor()
+		batch = []
+		for row in generate(config, first, last):
+			batch.append(row)
+			if len(batch) >= COPY_ROWS:
+				copy_rows(cursor, table_name, columns, batch)
+				total += len(batch)
+				batch = []
+		if batch:
+			copy_rows(cursor, table_name, columns, batch)
+			total += len(batch)
+		cursor.close()
+		raw.commit()
+	finally:
+		raw.close()
+	return total
+
+
+def _chunks(weights: list, target: int) -> list:
+	chunks = []
+	first = 0
+	size = 0
+	for index, weight in enumerate(weights):
+		size += weight
+		if size >= target:
+			chunks.append((first, index + 1))
+			first = index + 1
+			size = 0
+	if first < len(weights):
+		chunks.append((first, len(weights)))
+	return chunks
+
+
+def _zipf_counts(rng: random.Random, rooms: int, total: int, exponent: float) -> list:
+	ranks = list(range(1, rooms + 1))
+	rng.shuffle(ranks)
+	weights = [1.0 / rank ** exponent for rank in ranks]
+	scale = total / sum(weights)
+	counts = [int(weight * scale) for weight in weights]
+	remainder = total - sum(counts)
+	for index in sorted(range(rooms), key=lambda i: ranks[i])[:remainder]:
+		counts[index] += 1
+	return counts
+
+
+def _max_ids(conn) -> dict:
+	return {
+		phase: conn.execute(text(f'SELECT coalesce(max("id"), 0) FROM "{table_name}"')).scalar()
+		for phase, (table_name, _, _) in PHASES.items()
+	}
+
+
+def seedTables(
+	users: int,
+	rooms: int,
+	messages: int,
+	members_mean: float = 8.0,
+	zipf_exponent: float = 1.1,
+	start: datetime = datetime(2024, 1, 1),
+	end: datetime = datetime(2025, 1, 1),
+	seed: int = 0,
+	workers: int = 4,
+) -> dict:
+	rng = _rng(seed, "sizes", 0)
+	room_sizes = [
+		min(users, max(2, round(rng.expovariate(1.0 / members_mean))))
+		for _ in range(rooms)
+	]
+	if models.MESSAGES_PARTITIONED:
+		createPartitions(start.date())
+	with engine.connect() as conn:
+		bases = _max_ids(conn)
+	config = {
+		"seed": seed,
+		"users": users,
+		"start": start,
+		"span": (end - start).total_seconds(),
+		"room_sizes": room_sizes,
+		"message_counts": _zipf_counts(rng, rooms, messages, zipf_exponent),
+		"user_base": bases["users"],
+		"room_base": bases["chat_rooms"],
+		"member_base": bases["chat_members"],
+		"message_base": bases["messages"],
+	}
+	plans = {
+		"users": _chunks([1] * users, CHUNK_ROWS),
+		"chat_rooms": _chunks([1] * rooms, CHUNK_ROWS),
+		"chat_members": _chunks(room_sizes, CHUNK_ROWS),
+		"messages": _chunks(config["message_counts"], CHUNK_ROWS),
+	}
+	loaded = {}
+	started = time.perf_counter()
+	with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+		for phase, chunks in plans.items():
+			phase_started = time.perf_counter()
+			tasks = [(phase, config, first, last) for first, last in chunks]
+			loaded[phase] = sum(executor.map(_seed_chunk, tasks))
+			elapsed = time.perf_counter() - phase_started
+			rate = loaded[phase] / elapsed if elapsed > 0 else 0.0
+			print(f"seeded: {phase} rows={loaded[phase]} elapsed={elapsed:.2f}s rate={rate:.0f} rows/s")
+	with engine.begin() as conn:
+		for table_name, _, _ in PHASES.values():
+			conn.execute(
+				text(
+					f"SELECT setval(pg_get_serial_sequence('\"{table_name}\"', 'id'), "
+					f'coalesce((SELECT max("id") FROM "{table_name}"), 0) + 1, false)'
+				)
+			)
+			conn.execute(text(f'ANALYZE "{table_name}"'))
+	elapsed = time.perf_counter() - started
+	total = sum(loaded.values())
+	rate = total / elapsed if elapsed > 0 else 0.0
+	print(f"seeded: total rows={total} elapsed={elapsed:.2f}s rate={rate:.0f} rows/s")
+	return loaded
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--users", type=int, default=10000)
+	parser.add_argument("--rooms", type=int, default=1000)
+	parser.add_argument("--messages", type=int, default=1000000)
+	parser.add_argument("--members-mean", type=float, default=8.0, help="mean members per room")
+	parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of messages per room")
+	parser.add_argument("--start", default="2024-01-01", help="earliest timestamp")
+	parser.add_argument("--end", default="2025-01-01", help="latest timestamp")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+	args = parser.parse_args()
+
+	start = datetime.fromisoformat(args.start)
+	end = datetime.fromisoformat(args.end)
+	if args.users < 2 or args.rooms < 1 or end <= start:
+		print("invalid seed parameters")
+		return 1
+	seedTables(
+		args.users,
+		args.rooms,
+		args.messages,
+		args.members_mean,
+		args.zipf,
+		start,
+		end,
+		args.seed,
+		args.workers,
+	)
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
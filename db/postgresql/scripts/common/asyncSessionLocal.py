@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+from contextlib import asynccontextmanager
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from common.sessionLocal import (
+	MAX_OVERFLOW,
+	POOL_PRE_PING,
+	POOL_RECYCLE,
+	POOL_SIZE,
+	POOL_TIMEOUT,
+	STATEMENT_TIMEOUT,
+	dsn,
+)
+
+
+async_dsn = make_url(dsn).set(drivername="postgresql+asyncpg")
+
+connect_args = {}
+if STATEMENT_TIMEOUT:
+	connect_args["server_settings"] = {"statement_timeout": str(int(STATEMENT_TIMEOUT))}
+
+async_engine = create_async_engine(
+	async_dsn,
+	pool_size=POOL_SIZE,
+	max_overflow=MAX_OVERFLOW,
+	pool_timeout=POOL_TIMEOUT,
+	pool_recycle=POOL_RECYCLE,
+	pool_pre_ping=POOL_PRE_PING,
+	connect_args=connect_args,
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+
+@asynccontextmanager
+async def async_connect(conn=None):
+	if conn is not None:
+		yield conn
+		return
+	async with async_engine.connect() as new_conn:
+		yield new_conn
+
+
+@asynccontextmanager
+async def async_begin(conn=None):
+	if conn is None:
+		async with async_engine.begin() as new_conn:
+			yield new_conn
+	elif conn.in_transaction():
+		yield conn
+	else:
+		async with conn.begin():
+			yield conn
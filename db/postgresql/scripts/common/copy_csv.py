@@ -0,0 +1,12 @@
+import csv
+import io
+
+
+def copy_rows(cursor, table_name: str, columns: list, rows) -> None:
+	buffer = io.StringIO()
+	# default quoting leaves None as an unquoted empty field, which COPY csv reads as NULL
+	writer = csv.writer(buffer)
+	writer.writerows(rows)
+	buffer.seek(0)
+	names = ", ".join(f'"{name}"' for name in columns)
+	cursor.copy_expert(f'COPY "{table_name}" ({names}) FROM STDIN WITH (FORMAT csv)', buffer)
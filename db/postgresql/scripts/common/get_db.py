@@ -5,4 +5,4 @@ def get_db():
 	try:
 		yield db
 	finally:
-		db.close
\ No newline at end of file
+		db.close()
@@ -0,0 +1,128 @@
+import os
+import pickle
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+
+load_dotenv()
+CACHE_FILE = os.getenv("SCHEMA_CACHE_FILE")
+CHECK_INTERVAL = float(os.getenv("SCHEMA_CACHE_CHECK_INTERVAL", "5"))
+
+_CATALOG_VERSION_SQL = """
+SELECT md5(coalesce(string_agg(
+	c.oid::text || ':' || c.xmin::text || ':' || coalesce(a.attnum, 0)::text || ':' || coalesce(a.xmin::text, ''),
+	',' ORDER BY c.oid, a.attnum
+), ''))
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0
+WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p', 'v', 'm', 'i')
+"""
+
+_schemas = {}
+
+
+def _cache_key(engine) -> str:
+	url = engine.engine.url
+	return url.set(drivername=url.get_backend_name()).render_as_string(hide_password=True)
+
+
+def _load_file() -> dict:
+	if not CACHE_FILE or not os.path.exists(CACHE_FILE):
+		return {}
+	try:
+		with open(CACHE_FILE, "rb") as f:
+			return pickle.load(f)
+	except (OSError, pickle.UnpicklingError, EOFError):
+		return {}
+
+
+def _save_file() -> None:
+	if not CACHE_FILE:
+		return
+	data = {
+		key: {"version": state["version"], "table_names": state["table_names"], "tables": state["tables"]}
+		for key, state in _schemas.items()
+	}
+	tmp_path = f"{CACHE_FILE}.tmp"
+	try:
+		with open(tmp_path, "wb") as f:
+			pickle.dump(data, f)
+		os.replace(tmp_path, CACHE_FILE)
+	except OSError as exc:
+		print(f"schema cache write failed: {exc}")
+
+
+def _catalog_version(engine) -> str:
+	if isinstance(engine, Connection):
+		return engine.execute(text(_CATALOG_VERSION_SQL)).scalar()
+	with engine.connect() as conn:
+		return conn.execute(text(_CATALOG_VERSION_SQL)).scalar()
+
+
+def _state(engine) -> dict:
+	key = _cache_key(engine)
+	state = _schemas.get(key)
+	if state is None:
+		state = _load_file().get(key) or {"version": None, "table_names": None, "tables": {}}
+		state["checked_at"] = None
+		_schemas[key] = state
+	now = time.monotonic()
+	if state["checked_at"] is None or now - state["checked_at"] >= CHECK_INTERVAL:
+		version = _catalog_version(engine)
+		if version != state["version"]:
+			state.update(version=version, table_names=None, tables={})
+		state["checked_at"] = now
+	return state
+
+
+def _table(engine, table_name: str) -> dict:
+	state = _state(engine)
+	table = state["tables"].get(table_name)
+	if table is None:
+		inspector = inspect(engine)
+		table = {
+			"columns": inspector.get_columns(table_name),
+			"pk_columns": inspector.get_pk_constraint(table_name).get("constrained_columns", []),
+			"indexes": inspector.get_indexes(table_name),
+		}
+		state["tables"][table_name] = table
+		_save_file()
+	return table
+
+
+def get_table_names(engine) -> list:
+	state = _state(engine)
+	if state["table_names"] is None:
+		state["table_names"] = inspect(engine).get_table_names()
+		_save_file()
+	return state["table_names"]
+
+
+def get_columns(engine, table_name: str) -> list:
+	return _table(engine, table_name)["columns"]
+
+
+def get_pk_columns(engine, table_name: str) -> list:
+	return _table(engine, table_name)["pk_columns"]
+
+
+def get_indexes(engine, table_name: str) -> list:
+	return _table(engine, table_name)["indexes"]
+
+
+def invalidate_schema(engine, table_name: Optional[str] = None) -> None:
+	state = _schemas.get(_cache_key(engine))
+	if state is None:
+		return
+	state["table_names"] = None
+	if table_name is None:
+		state["tables"] = {}
+	else:
+		state["tables"].pop(table_name, None)
+	state["checked_at"] = None
+	_save_file()
@@ -0,0 +1,115 @@
+from sqlalchemy import text
+
+# Member_inbox keeps chat_members.last_activity_at and Member_unread keeps chat_members.unread_count, both
+# driven by inserts into and deletes from messages. Separate triggers would rewrite every member row of a
+# room twice per statement, so shared statement triggers update whichever columns are installed in one UPDATE.
+
+UNREAD_MATCH = (
+	'm."room_id" = cm."room_id" '
+	"AND m.\"created_at\" > coalesce(cm.\"last_read_at\", '-infinity'::timestamp) "
+	'AND m."sender_id" IS DISTINCT FROM cm."user_id"'
+)
+
+# each feature's own trigger marks it as installed
+_INSTALLED_SQL = """
+SELECT 'activity' FROM pg_trigger
+WHERE tgrelid = '"messages"'::regclass AND tgname = 'messages_room_last_message_insert'
+UNION
+SELECT 'unread' FROM pg_trigger
+WHERE tgrelid = '"chat_members"'::regclass AND tgname = 'chat_members_unread_count'
+"""
+
+_DROP_SQL = [
+	'DROP TRIGGER IF EXISTS "messages_member_insert" ON "messages"',
+	'DROP TRIGGER IF EXISTS "messages_member_delete" ON "messages"',
+	"DROP FUNCTION IF EXISTS chat_members_on_message_insert()",
+	"DROP FUNCTION IF EXISTS chat_members_on_message_delete()",
+]
+
+# the room's latest remaining message; computed from messages because this trigger may fire before
+# Member_inbox's own delete trigger has moved the chat_rooms pointer
+_LATEST_REMAINING = (
+	'LEFT JOIN LATERAL (SELECT m."created_at" FROM "messages" m WHERE m."room_id" = d."room_id" '
+	'ORDER BY m."created_at" DESC, m."id" DESC LIMIT 1) AS lm ON true'
+)
+
+
+def installed_features(conn) -> set:
+	return {row[0] for row in conn.execute(text(_INSTALLED_SQL))}
+
+
+def _insert_function_sql(features: set) -> str:
+	assignments, selected, changed = [], ['cm."id"'], []
+	if "unread" in features:
+		assignments.append('"unread_count" = target."unread_count" + d."unread"')
+		selected.append(f'count(*) FILTER (WHERE {UNREAD_MATCH}) AS "unread"')
+		changed.append('d."unread" > 0')
+	if "activity" in features:
+		assignments.append('"last_activity_at" = GREATEST(target."last_activity_at", d."created_at")')
+		selected.append('max(m."created_at") AS "created_at"')
+		changed.append('target."last_activity_at" IS NULL OR target."last_activity_at" < d."created_at"')
+	return f"""
+	CREATE OR REPLACE FUNCTION chat_members_on_message_insert() RETURNS trigger AS $$
+	BEGIN
+		UPDATE "chat_members" AS target SET {", ".join(assignments)}
+		FROM (
+			SELECT {", ".join(selected)}
+			FROM new_messages m JOIN "chat_members" cm ON m."room_id" = cm."room_id"
+			GROUP BY cm."id"
+		) AS d
+		WHERE target."id" = d."id" AND ({" OR ".join(changed)});
+		RETURN NULL;
+	END;
+	$$ LANGUAGE plpgsql
+	"""
+
+
+def _delete_function_sql(features: set) -> str:
+	assignments, changed, latest = [], [], ""
+	if "unread" in features:
+		assignments.append('"unread_count" = target."unread_count" - d."unread"')
+		changed.append('d."unread" > 0')
+	if "activity" in features:
+		activity = 'COALESCE(lm."created_at", target."joined_at")'
+		assignments.append(f'"last_activity_at" = {activity}')
+		changed.append(f'target."last_activity_at" IS DISTINCT FROM {activity}')
+		latest = _LATEST_REMAINING
+	return f"""
+	CREATE OR REPLACE FUNCTION chat_members_on_message_delete() RETURNS trigger AS $$
+	BEGIN
+		UPDATE "chat_members" AS target SET {", ".join(assignments)}
+		FROM (
+			SELECT cm."id", cm."room_id", count(*) FILTER (WHERE {UNREAD_MATCH}) AS "unread"
+			FROM old_messages m JOIN "chat_members" cm ON m."room_id" = cm."room_id"
+			GROUP BY cm."id", cm."room_id"
+		) AS d {latest}
+		WHERE target."id" = d."id" AND ({" OR ".join(changed)});
+		RETURN NULL;
+	END;
+	$$ LANGUAGE plpgsql
+	"""
+
+
+def refresh_member_trigger(conn) -> None:
+	# call after installing or uninstalling either feature, inside the same transaction
+	features = installed_features(conn)
+	for statement in _DROP_SQL:
+		conn.execute(text(statement))
+	if not features:
+		return
+	conn.execute(text(_insert_function_sql(features)))
+	conn.execute(text(_delete_function_sql(features)))
+	conn.execute(
+		text(
+			'CREATE TRIGGER "messages_member_insert" AFTER INSERT ON "messages" '
+			"REFERENCING NEW TABLE AS new_messages "
+			"FOR EACH STATEMENT EXECUTE FUNCTION chat_members_on_message_insert()"
+		)
+	)
+	conn.execute(
+		text(
+			'CREATE TRIGGER "messages_member_delete" AFTER DELETE ON "messages" '
+			"REFERENCING OLD TABLE AS old_messages "
+			"FOR EACH STATEMENT EXECUTE FUNCTION chat_members_on_message_delete()"
+		)
+	)
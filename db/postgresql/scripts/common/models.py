@@ -1,8 +1,15 @@
+import os
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from dotenv import load_dotenv
+from sqlalchemy import Boolean, Column, Computed, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import declarative_base, relationship
 
+load_dotenv()
+MESSAGES_PARTITIONED = os.getenv("MESSAGES_PARTITIONED", "false").lower() in {"true", "1", "yes", "y"}
+TEXT_SEARCH_CONFIG = "english"
+
 Base = declarative_base()
 
 
@@ -27,6 +34,8 @@ class ChatRoom(Base):
 	id = Column(Integer, primary_key=True, index=True)
 	name = Column(String(255), nullable=False)
 	is_direct = Column(Boolean, default=False, nullable=False)
+	last_message_id = Column(Integer, nullable=True)
+	last_message_at = Column(DateTime, nullable=True)
 	created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 	updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -36,13 +45,19 @@ class ChatRoom(Base):
 
 class ChatMember(Base):
 	__tablename__ = "chat_members"
+	__table_args__ = (
+		Index("ix_chat_members_user_id_last_activity_at_room_id", "user_id", "last_activity_at", "room_id"),
+	)
 
 	id = Column(Integer, primary_key=True, index=True)
 	room_id = Column(Integer, ForeignKey("chat_rooms.id", ondelete="CASCADE"), nullable=False, index=True)
-	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+	# the (user_id, last_activity_at, room_id) index above covers lookups by user_id
+	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 	role = Column(String(50), default="member", nullable=False)
 	joined_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 	last_read_at = Column(DateTime, nullable=True)
+	unread_count = Column(Integer, default=0, server_default="0", nullable=False)
+	last_activity_at = Column(DateTime, nullable=True)
 
 	room = relationship("ChatRoom", back_populates="members")
 	user = relationship("User", back_populates="chat_memberships")
@@ -50,13 +65,19 @@ class ChatMember(Base):
 
 class Message(Base):
 	__tablename__ = "messages"
-
-	id = Column(Integer, primary_key=True, index=True)
-	room_id = Column(Integer, ForeignKey("chat_rooms.id", ondelete="CASCADE"), nullable=False, index=True)
+	__table_args__ = (
+		Index("ix_messages_room_id_created_at_id", "room_id", "created_at", "id"),
+		Index("ix_messages_body_tsv", "body_tsv", postgresql_using="gin"),
+		{"postgresql_partition_by": "RANGE (created_at)"} if MESSAGES_PARTITIONED else {},
+	)
+
+	id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+	room_id = Column(Integer, ForeignKey("chat_rooms.id", ondelete="CASCADE"), nullable=False)
 	sender_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
 	body = Column(Text, nullable=False)
+	body_tsv = Column(TSVECTOR, Computed(f"to_tsvector('{TEXT_SEARCH_CONFIG}', body)", persisted=True))
 	is_system = Column(Boolean, default=False, nullable=False)
-	created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+	created_at = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=MESSAGES_PARTITIONED)
 	updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 	room = relationship("ChatRoom", back_populates="messages")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+import atexit
+import bisect
+import re
+import sys
+import threading
+import time
+
+from sqlalchemy import event
+
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SUMMARY_LIMIT = 20
+
+_lock = threading.Lock()
+_stats = {}
+_explained = set()
+_whitespace = re.compile(r"\s+")
+
+
+def _normalize(statement: str) -> str:
+	return _whitespace.sub(" ", statement).strip()
+
+
+def _record(statement: str, elapsed_ms: float, rowcount: int) -> None:
+	bucket = bisect.bisect_left(BUCKETS_MS, elapsed_ms)
+	with _lock:
+		entry = _stats.get(statement)
+		if entry is None:
+			entry = _stats[statement] = {
+				"calls": 0,
+				"total_ms": 0.0,
+				"max_ms": 0.0,
+				"rows": 0,
+				"histogram": [0] * (len(BUCKETS_MS) + 1),
+			}
+		entry["calls"] += 1
+		entry["total_ms"] += elapsed_ms
+		entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+		if rowcount > 0:
+			entry["rows"] += rowcount
+		entry["histogram"][bucket] += 1
+
+
+def _explain(cursor, statement: str, parameters) -> None:
+	dbapi_conn = cursor.connection
+	# an AUTOCOMMIT connection (CREATE INDEX CONCURRENTLY and friends) has no transaction to hold a savepoint,
+	# and a failed EXPLAIN there aborts nothing, so the savepoint only guards an open transaction
+	savepoint = not dbapi_conn.autocommit
+	try:
+		explain_cursor = dbapi_conn.cursor()
+		try:
+			if savepoint:
+				explain_cursor.execute("SAVEPOINT query_stats_explain")
+			try:
+				# plain EXPLAIN only plans; ANALYZE would run the statement again, repeating side effects such as
+				# pg_notify() or setval() inside a SELECT. Use auto_explain on the server for measured plans.
+				explain_cursor.execute(f"EXPLAIN {statement}", parameters)
+				plan = "\n".join(row[0] for row in explain_cursor.fetchall())
+			except Exception as exc:
+				if savepoint:
+					explain_cursor.execute("ROLLBACK TO SAVEPOINT query_stats_explain")
+				plan = f"explain failed: {exc}"
+			else:
+				if savepoint:
+					explain_cursor.execute("RELEASE SAVEPOINT query_stats_explain")
+		finally:
+			explain_cursor.close()
+	except Exception as exc:
+		# diagnostics must never fail the statement that was being measured
+		plan = f"explain failed: {exc}"
+	print(plan, file=sys.stderr)
+
+
+def instrument(engine, slow_ms: float = 100.0, explain: bool = False) -> None:
+	@event.listens_for(engine, "before_cursor_execute")
+	def _before(conn, cursor, statement, parameters, context, executemany):
+		conn.info.setdefault("query_stats_started", []).append(time.perf_counter())
+
+	@event.listens_for(engine, "after_cursor_execute")
+	def _after(conn, cursor, statement, parameters, context, executemany):
+		elapsed_ms = (time.perf_counter() - conn.info["query_stats_started"].pop()) * 1000
+		key = _normalize(statement)
+		_record(key, elapsed_ms, cursor.rowcount)
+		if elapsed_ms < slow_ms:
+			return
+		print(f"slow query: {elapsed_ms:.1f}ms rows={cursor.rowcount} {key}", file=sys.stderr)
+		if not explain or executemany or key[:6].upper() != "SELECT":
+			return
+		with _lock:
+			if key in _explained:
+				return
+			_explained.add(key)
+		_explain(cursor, statement, parameters)
+
+	@event.listens_for(engine, "handle_error")
+	def _error(context):
+		connection = context.connection
+		if connection is not None and connection.info.get("query_stats_started"):
+			connection.info["query_stats_started"].pop()
+
+	atexit.register(print_query_summary)
+
+
+def _percentile(histogram: list, calls: int, pct: float) -> float:
+	target = calls * pct
+	seen = 0
+	for index, count in enumerate(histogram):
+		seen += count
+		if seen >= target:
+			return BUCKETS_MS[index] if index < len(BUCKETS_MS) else float("inf")
+	return float("inf")
+
+
+def query_stats() -> dict:
+	with _lock:
+		return {
+			statement: {**entry, "histogram": list(entry["histogram"])}
+			for statement, entry in _stats.items()
+		}
+
+
+def reset_query_stats() -> None:
+	with _lock:
+		_stats.clear()
+		_explained.clear()
+
+
+def print_query_summary(limit: int = SUMMARY_LIMIT) -> None:
+	stats = query_stats()
+	if not stats:
+		return
+	ranked = sorted(stats.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+	print("calls\ttotal_ms\tmean_ms\tp50_ms<=\tp95_ms<=\tmax_ms\trows\tstatement", file=sys.stderr)
+	for statement, entry in ranked[:limit]:
+		calls = entry["calls"]
+		print(
+			f"{calls}\t{entry['total_ms']:.1f}\t{entry['total_ms'] / calls:.3f}\t"
+			f"{_percentile(entry['histogram'], calls, 0.50)}\t{_percentile(entry['histogram'], calls, 0.95)}\t"
+			f"{entry['max_ms']:.1f}\t{entry['rows']}\t{statement[:200]}",
+			file=sys.stderr,
+		)
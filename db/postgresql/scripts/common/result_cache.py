@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+import os
+import select
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from common.sessionLocal import engine
+
+
+load_dotenv()
+CACHE_ENABLED = os.getenv("DB_RESULT_CACHE", "false").lower() in {"true", "1", "yes", "y"}
+CACHE_TTL = float(os.getenv("DB_RESULT_CACHE_TTL", "30"))
+CACHE_MAX_BYTES = int(os.getenv("DB_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_MAX_ROWS = int(os.getenv("DB_RESULT_CACHE_MAX_ROWS", "1000"))
+# set DB_RESULT_CACHE_NOTIFY=true on writers that do not cache themselves but share a database with processes that do
+CACHE_NOTIFY = os.getenv("DB_RESULT_CACHE_NOTIFY", str(CACHE_ENABLED)).lower() in {"true", "1", "yes", "y"}
+NOTIFY_CHANNEL = "result_cache_invalidate"
+LISTEN_TIMEOUT = 5.0
+
+
+def _rows_bytes(rows: list) -> int:
+	return sys.getsizeof(rows) + sum(
+		sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in rows
+	)
+
+
+class ResultCache:
+	def __init__(self, ttl: float, max_bytes: int):
+		self.ttl = ttl
+		self.max_bytes = max_bytes
+		self._entries = OrderedDict()
+		self._tables = {}
+		self._generations = {}
+		self._generation = 0
+		self._lock = threading.Lock()
+		self.bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.expirations = 0
+		self.invalidations = 0
+
+	def _remove(self, key) -> None:
+		table_name, _, size, _ = self._entries.pop(key)
+		self.bytes -= size
+		keys = self._tables.get(table_name)
+		if keys is not None:
+			keys.discard(key)
+			if not keys:
+				del self._tables[table_name]
+
+	def get(self, key) -> Optional[list]:
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None:
+				self.misses += 1
+				return None
+			if time.monotonic() >= entry[3]:
+				self._remove(key)
+				self.expirations += 1
+				self.misses += 1
+				return None
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return entry[1]
+
+	def generation(self, table_name: str) -> tuple:
+		with self._lock:
+			return (self._generation, self._generations.get(table_name, 0))
+
+	def put(self, key, table_name: str, rows: list, generation: Optional[tuple] = None) -> None:
+		size = _rows_bytes(rows)
+		if size > self.max_bytes:
+			return
+		with self._lock:
+			if generation is not None and generation != (self._generation, self._generations.get(table_name, 0)):
+				# an invalidation arrived while the rows were being read, so they may already be stale
+				return
+			if key in self._entries:
+				self._remove(key)
+			while self._entries and self.bytes + size > self.max_bytes:
+				self._remove(next(iter(self._entries)))
+				self.evictions += 1
+			self._entries[key] = (table_name, rows, size, time.monotonic() + self.ttl)
+			self._tables.setdefault(table_name, set()).add(key)
+			self.bytes += size
+
+	def invalidate(self, table_name: Optional[str] = None) -> None:
+		with self._lock:
+			if table_name is None:
+				self._generation += 1
+				keys = list(self._entries)
+			else:
+				self._generations[table_name] = self._generations.get(table_name, 0) + 1
+				keys = list(self._tables.get(table_name, ()))
+			for key in keys:
+				self._remove(key)
+			self.invalidations += len(keys)
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {
+				"entries": len(self._entries),
+				"bytes": self.bytes,
+				"hits": self.hits,
+				"misses": self.misses,
+				"evictions": self.evictions,
+				"expirations": self.expirations,
+				"invalidations": self.invalidations,
+			}
+
+
+result_cache = ResultCache(CACHE_TTL, CACHE_MAX_BYTES)
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _listen() -> None:
+	while True:
+		raw = None
+		try:
+			raw = engine.raw_connection()
+			raw.detach()
+			dbapi_conn = raw.driver_connection
+			dbapi_conn.autocommit = True
+			cursor = dbapi_conn.cursor()
+			cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+			result_cache.invalidate()
+			while True:
+				if select.select([dbapi_conn], [], [], LISTEN_TIMEOUT) == ([], [], []):
+					continue
+				dbapi_conn.poll()
+				while dbapi_conn.notifies:
+					notify = dbapi_conn.notifies.pop(0)
+					result_cache.invalidate(notify.payload or None)
+		except Exception as exc:
+			print(f"result cache listener failed: {exc}", file=sys.stderr)
+			result_cache.invalidate()
+			if raw is not None:
+				raw.close()
+			time.sleep(LISTEN_TIMEOUT)
+
+
+def _start_listener() -> None:
+	global _listener
+	if _listener is not None:
+		return
+	with _listener_lock:
+		if _listener is None:
+			_listener = threading.Thread(target=_listen, name="result-cache-listener", daemon=True)
+			_listener.start()
+
+
+def cache_get(key) -> Optional[list]:
+	if not CACHE_ENABLED:
+		return None
+	_start_listener()
+	return result_cache.get(key)
+
+
+def cache_generation(table_name: str) -> Optional[tuple]:
+	return result_cache.generation(table_name) if CACHE_ENABLED else None
+
+
+def cache_put(key, table_name: str, rows: list, generation: Optional[tuple] = None, conn=None) -> None:
+	# generations track invalidations committed on the primary, so rows read from a lagging replica
+	# could predate a write that was already invalidated; only primary reads are cached
+	if conn is not None and conn.engine is not engine:
+		return
+	if CACHE_ENABLED and len(rows) <= CACHE_MAX_ROWS:
+		result_cache.put(key, table_name, rows, generation)
+
+
+def _capture(rows, captured: list):
+	for row in rows:
+		if len(captured) <= CACHE_MAX_ROWS:
+			captured.append(row)
+		yield row
+
+
+def capture_rows(rows, captured: list):
+	return _capture(rows, captured) if CACHE_ENABLED else rows
+
+
+def invalidate_table(table_name: str, conn=None) -> None:
+	if CACHE_ENABLED:
+		result_cache.invalidate(table_name)
+	if CACHE_NOTIFY and conn is not None:
+		conn.execute(text("SELECT pg_notify(:channel, :table_name)"), {"channel": NOTIFY_CHANNEL, "table_name": table_name})
+
+
+def cache_stats() -> dict:
+	return result_cache.stats()
@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
+import itertools
 import os
-import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.engine import URL
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 
 load_dotenv()
@@ -20,7 +27,217 @@ if not dsn:
 		database=os.getenv("POSTGRES_DB", "postgres"),
 	)
 
-engine = create_engine(dsn)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in {"true", "1", "yes", "y"}
+STATEMENT_TIMEOUT = os.getenv("DB_STATEMENT_TIMEOUT")
+QUERY_STATS = os.getenv("DB_QUERY_STATS", "false").lower() in {"true", "1", "yes", "y"}
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+EXPLAIN_SLOW = os.getenv("DB_EXPLAIN_SLOW", "false").lower() in {"true", "1", "yes", "y"}
+REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_POLICY = os.getenv("DB_REPLICA_POLICY", "round_robin")
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "1"))
+READ_YOUR_WRITES = float(os.getenv("DB_READ_YOUR_WRITES", "5"))
+
+_REPLICA_LAG_SQL = """
+SELECT CASE
+	WHEN NOT pg_is_in_recovery() THEN 0
+	WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+	ELSE coalesce(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class TimedQueuePool(QueuePool):
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self._stats_lock = threading.Lock()
+		self.checkouts = 0
+		self.wait_total = 0.0
+		self.wait_max = 0.0
+
+	def _do_get(self):
+		started = time.perf_counter()
+		try:
+			return super()._do_get()
+		finally:
+			waited = time.perf_counter() - started
+			with self._stats_lock:
+				self.checkouts += 1
+				self.wait_total += waited
+				self.wait_max = max(self.wait_max, waited)
+
+	def recreate(self):
+		pool = super().recreate()
+		pool.checkouts = self.checkouts
+		pool.wait_total = self.wait_total
+		pool.wait_max = self.wait_max
+		return pool
+
+
+connect_args = {}
+if STATEMENT_TIMEOUT:
+	connect_args["options"] = f"-c statement_timeout={int(STATEMENT_TIMEOUT)}"
+
+
+def _create_engine(url):
+	new_engine = create_engine(
+		url,
+		poolclass=TimedQueuePool,
+		pool_size=POOL_SIZE,
+		max_overflow=MAX_OVERFLOW,
+		pool_timeout=POOL_TIMEOUT,
+		pool_recycle=POOL_RECYCLE,
+		pool_pre_ping=POOL_PRE_PING,
+		connect_args=connect_args,
+	)
+	if QUERY_STATS:
+		from common.query_stats import instrument
+
+		instrument(new_engine, SLOW_QUERY_MS, EXPLAIN_SLOW)
+	return new_engine
+
+
+engine = _create_engine(dsn)
+replica_engines = [_create_engine(url) for url in REPLICA_URLS]
 SessionLocal = sessionmaker(bind=engine)
 
+_shared_conn = ContextVar("shared_conn", default=None)
+_primary_reads = ContextVar("primary_reads", default=False)
+_last_write = ContextVar("last_write", default=None)
+_replica_state = [{"lag": None, "checked_at": None} for _ in replica_engines]
+_replica_turn = itertools.count()
+
+
+@contextmanager
+def shared_connection():
+	current = _shared_conn.get()
+	if current is not None:
+		yield current
+		return
+	with engine.connect() as conn:
+		token = _shared_conn.set(conn)
+		try:
+			yield conn
+			if conn.in_transaction():
+				conn.commit()
+		finally:
+			_shared_conn.reset(token)
+
+
+@contextmanager
+def connect(conn=None):
+	conn = conn if conn is not None else _shared_conn.get()
+	if conn is not None:
+		owned = not conn.in_transaction()
+		try:
+			yield conn
+		except BaseException:
+			if owned and conn.in_transaction():
+				conn.rollback()
+			raise
+		if owned and conn.in_transaction():
+			conn.commit()
+		return
+	with engine.connect() as new_conn:
+		yield new_conn
+
+
+@contextmanager
+def begin(conn=None):
+	_last_write.set(time.monotonic())
+	conn = conn if conn is not None else _shared_conn.get()
+	if conn is None:
+		with engine.begin() as new_conn:
+			yield new_conn
+	elif conn.in_transaction():
+		yield conn
+	else:
+		with conn.begin():
+			yield conn
+
+
+def _replica_lag(index: int) -> Optional[float]:
+	state = _replica_state[index]
+	now = time.monotonic()
+	if state["checked_at"] is None or now - state["checked_at"] >= REPLICA_CHECK_INTERVAL:
+		try:
+			with replica_engines[index].connect() as conn:
+				state["lag"] = float(conn.execute(text(_REPLICA_LAG_SQL)).scalar())
+		except DBAPIError:
+			state["lag"] = None
+		state["checked_at"] = now
+	return state["lag"]
+
+
+def read_engine():
+	if not replica_engines or _primary_reads.get():
+		return engine
+	last_write = _last_write.get()
+	if last_write is not None and time.monotonic() - last_write < READ_YOUR_WRITES:
+		return engine
+	healthy = []
+	for index, replica in enumerate(replica_engines):
+		lag = _replica_lag(index)
+		if lag is not None and lag <= REPLICA_MAX_LAG:
+			healthy.append(replica)
+	if not healthy:
+		return engine
+	if REPLICA_POLICY == "least_connections":
+		return min(healthy, key=lambda replica: replica.pool.checkedout())
+	return healthy[next(_replica_turn) % len(healthy)]
+
+
+@contextmanager
+def read_connect(conn=None):
+	if conn is not None or _shared_conn.get() is not None:
+		with connect(conn) as conn:
+			yield conn
+		return
+	target = read_engine()
+	try:
+		new_conn = target.connect()
+	except DBAPIError:
+		if target is engine:
+			raise
+		_replica_state[replica_engines.index(target)].update(lag=None, checked_at=time.monotonic())
+		new_conn = engine.connect()
+	with new_conn:
+		yield new_conn
+
+
+@contextmanager
+def primary_reads():
+	token = _primary_reads.set(True)
+	try:
+		yield
+	finally:
+		_primary_reads.reset(token)
+
 
+def pool_stats() -> dict:
+	pool = engine.pool
+	stats = {
+		"size": pool.size(),
+		"checked_in": pool.checkedin(),
+		"checked_out": pool.checkedout(),
+		"overflow": pool.overflow(),
+	}
+	if isinstance(pool, TimedQueuePool):
+		stats["checkouts"] = pool.checkouts
+		stats["wait_total"] = pool.wait_total
+		stats["wait_avg"] = pool.wait_total / pool.checkouts if pool.checkouts else 0.0
+		stats["wait_max"] = pool.wait_max
+	if replica_engines:
+		stats["replicas"] = [
+			{
+				"url": replica.url.render_as_string(hide_password=True),
+				"checked_out": replica.pool.checkedout(),
+				"lag": state["lag"],
+			}
+			for replica, state in zip(replica_engines, _replica_state)
+		]
+	return stats
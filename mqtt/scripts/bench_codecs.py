@@ -0,0 +1,46 @@
+import argparse
+import time
+
+from common.payload_codecs import available_codecs, get_codec
+
+SIGNAL_LENGTHS = (2, 16, 128)
+
+
+def _payload(signal_length: int) -> dict:
+    return {
+        "protocol": "Panasonic_AC",
+        "signalState": [f"0x{index * 37 % 256:02x}" for index in range(signal_length)],
+        "sentAt": "2024-01-01T12:00:00+09:00",
+    }
+
+
+def _time_us(func, arg, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func(arg)
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--signal-lengths", type=int, nargs="+", default=list(SIGNAL_LENGTHS))
+    args = parser.parse_args()
+
+    print(f"{'codec':<8} {'signal':>6} {'bytes':>6} {'encode_us':>10} {'decode_us':>10} {'decode_mv_us':>13}")
+    for length in args.signal_lengths:
+        payload = _payload(length)
+        for name in available_codecs():
+            codec = get_codec(name)
+            data = codec.encode(payload)
+            if codec.decode(data) != payload:
+                print(f"{name:<8} {length:>6} round trip mismatch")
+                continue
+            encode_us = _time_us(codec.encode, payload, args.iterations)
+            decode_us = _time_us(codec.decode, data, args.iterations)
+            view_us = _time_us(codec.decode, memoryview(data), args.iterations)
+            print(f"{name:<8} {length:>6} {len(data):>6} {encode_us:>10.2f} {decode_us:>10.2f} {view_us:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import asyncio
+import random
+import socket
+import threading
+import weakref
+from typing import AsyncIterator, Optional
+
+import paho.mqtt.client as mqtt
+
+from common.common import BROKER_HOST, BROKER_PORT, build_client
+
+MISC_INTERVAL = 1.0
+RECONNECT_MIN = 0.5
+RECONNECT_MAX = 30.0
+MESSAGE_QUEUE_SIZE = 1000
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+class _Hub:
+    # one housekeeping task per event loop runs loop_misc (keepalive pings, retries) for every client
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.clients = set()
+        self.task = loop.create_task(self._misc())
+
+    async def _misc(self) -> None:
+        while True:
+            await asyncio.sleep(MISC_INTERVAL)
+            for client in list(self.clients):
+                client.loop_misc()
+
+
+def _hub(loop: asyncio.AbstractEventLoop) -> _Hub:
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = _Hub(loop)
+    return hub
+
+
+class AsyncClient:
+    def __init__(self, client_id_suffix: str, clean_session: bool = True, queue_size: int = MESSAGE_QUEUE_SIZE) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self.client = build_client(client_id_suffix, on_connect=self._handle_connect, clean_session=clean_session)
+        self.client.on_disconnect = self._handle_disconnect
+        self.client.on_publish = self._handle_publish
+        self.client.on_message = self._handle_message
+        self.client.on_socket_open = self._on_socket_open
+        self.client.on_socket_close = self._on_socket_close
+        self.client.on_socket_register_write = self._on_socket_register_write
+        self.client.on_socket_unregister_write = self._on_socket_unregister_write
+        self._connected = asyncio.Event()
+        self._publishes = {}
+        self._early_publishes = set()
+        self._subscriptions = {}
+        # unbounded so put_nowait never raises inside a paho callback; queue_size is where reading pauses
+        self._messages = asyncio.Queue()
+        self._queue_size = queue_size
+        self._sock: Optional[socket.socket] = None
+        self._reading_paused = False
+        self._pause_timer: Optional[asyncio.TimerHandle] = None
+        self._keepalive = 60
+        self._reconnecting: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def _on_loop(self, callback, *args) -> None:
+        # connect/reconnect run in an executor thread, and paho fires the socket callbacks from there
+        if threading.get_ident() == self._loop_thread:
+            callback(*args)
+        else:
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    def _attach(self, client: mqtt.Client, sock: socket.socket) -> None:
+        self._sock = sock
+        if not self._reading_paused:
+            self._loop.add_reader(sock, client.loop_read)
+        _hub(self._loop).clients.add(client)
+
+    def _detach(self, client: mqtt.Client, sock: socket.socket) -> None:
+        self._loop.remove_reader(sock)
+        self._loop.remove_writer(sock)
+        if self._sock is sock:
+            self._sock = None
+        _hub(self._loop).clients.discard(client)
+
+    def _on_socket_open(self, client: mqtt.Client, _userdata, sock: socket.socket) -> None:
+        self._on_loop(self._attach, client, sock)
+
+    def _on_socket_close(self, client: mqtt.Client, _userdata, sock: socket.socket) -> None:
+        self._on_loop(self._detach, client, sock)
+
+    def _on_socket_register_write(self, client: mqtt.Client, _userdata, sock: socket.socket) -> None:
+        self._on_loop(self._loop.add_writer, sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, _client: mqtt.Client, _userdata, sock: socket.socket) -> None:
+        self._on_loop(self._loop.remove_writer, sock)
+
+    def _handle_connect(self, client: mqtt.Client, _userdata, _flags, rc: int) -> None:
+        if rc != 0:
+            return
+        self._connected.set()
+        for topic, qos in self._subscriptions.items():
+            client.subscribe(topic, qos)
+
+    def _handle_disconnect(self, _client: mqtt.Client, _userdata, rc: int) -> None:
+        self._on_loop(self._disconnected, rc)
+
+    def _disconnected(self, rc: int) -> None:
+        self._connected.clear()
+        if rc != 0 and not self._closing and self._reconnecting is None:
+            self._reconnecting = self._loop.create_task(self._reconnect())
+
+    def _handle_publish(self, _client: mqtt.Client, _userdata, mid: int) -> None:
+        future = self._publishes.pop(mid, None)
+        if future is None:
+            self._early_publishes.add(mid)
+        elif not future.done():
+            future.set_result(None)
+
+    def _handle_message(self, _client: mqtt.Client, _userdata, message: mqtt.MQTTMessage) -> None:
+        self._messages.put_nowait(message)
+        if not self._reading_paused and self._messages.qsize() >= self._queue_size:
+            self._pause_reading()
+
+    def _pause_reading(self) -> None:
+        # stop reading the socket until the consumer catches up; the broker buffers meanwhile. A paused
+        # reader also misses PINGRESP and PUBACK, so the pause is capped at half the keepalive: after
+        # that reading resumes and the queue grows past queue_size rather than the broker dropping us.
+        self._reading_paused = True
+        if self._sock is not None:
+            self._loop.remove_reader(self._sock)
+        self._pause_timer = self._loop.call_later(self._keepalive / 2, self._resume_reading)
+
+    def _resume_reading(self) -> None:
+        if self._pause_timer is not None:
+            self._pause_timer.cancel()
+            self._pause_timer = None
+        self._reading_paused = False
+        if self._sock is not None:
+            self._loop.add_reader(self._sock, self.client.loop_read)
+
+    async def connect(self, host: str = BROKER_HOST, port: int = BROKER_PORT, keepalive: int = 60) -> None:
+        self._keepalive = keepalive
+        delay = RECONNECT_MIN
+        while True:
+            try:
+                # DNS lookup and the TCP handshake block, so they stay off the event loop
+                await self._loop.run_in_executor(None, self.client.connect, host, port, keepalive)
+                return
+            except OSError as exc:
+                print(f"connect failed: {exc}; retrying...")
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, RECONNECT_MAX)
+
+    async def wait_for_connection(self, timeout: float = 5.0) -> None:
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("timed out waiting for MQTT connection") from None
+
+    async def _reconnect(self) -> None:
+        delay = RECONNECT_MIN
+        try:
+            while not self._closing:
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                try:
+                    await self._loop.run_in_executor(None, self.client.reconnect)
+                    return
+                except OSError as exc:
+                    print(f"reconnect failed: {exc}; retrying...")
+                    delay = min(delay * 2, RECONNECT_MAX)
+        finally:
+            self._reconnecting = None
+
+    async def publish(self, topic: str, payload, qos: int = 0, retain: bool = False) -> None:
+        await self._connected.wait()
+        info = self.client.publish(topic, payload, qos=qos, retain=retain)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS and qos == 0:
+            raise ConnectionError(f"publish failed: {mqtt.error_string(info.rc)}")
+        if info.mid in self._early_publishes:
+            self._early_publishes.discard(info.mid)
+            return
+        future = self._loop.create_future()
+        self._publishes[info.mid] = future
+        await future
+
+    def subscribe(self, topic: str, qos: int = 0) -> None:
+        self._subscriptions[topic] = qos
+        if self._connected.is_set():
+            self.client.subscribe(topic, qos)
+
+    async def messages(self) -> AsyncIterator[mqtt.MQTTMessage]:
+        while True:
+            message = await self._messages.get()
+            if self._reading_paused and self._messages.qsize() <= self._queue_size // 2:
+                self._resume_reading()
+            yield message
+
+    async def disconnect(self) -> None:
+        self._closing = True
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+        self.client.disconnect()
+        for future in self._publishes.values():
+            if not future.done():
+                future.cancel()
+        self._publishes.clear()
+
+    async def __aenter__(self) -> "AsyncClient":
+        await self.connect()
+        await self.wait_for_connection()
+        return self
+
+    async def __aexit__(self, *_exc) -> None:
+        await self.disconnect()
@@ -2,6 +2,7 @@ import os
 import time
 import json
 import threading
+import warnings
 from typing import Callable, Optional
 
 import paho.mqtt.client as mqtt
@@ -20,9 +21,20 @@ def build_client(
     on_connect: Optional[
         Callable[[mqtt.Client, object, dict, int], None]
     ] = None,
+    clean_session: bool = True,
+    manual_ack: bool = False,
 ) -> mqtt.Client:
     client_id = f"{CLIENT_ID_PREFIX}-{client_id_suffix}"
-    client = mqtt.Client(client_id=client_id)
+    with warnings.catch_warnings():
+        # VERSION1 keeps the callback signatures used throughout these scripts; paho 2 flags it as
+        # deprecated on every client, which is noise until the callbacks move to VERSION2
+        warnings.simplefilter("ignore", DeprecationWarning)
+        client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION1,
+            client_id=client_id,
+            clean_session=clean_session,
+            manual_ack=manual_ack,
+        )
     client._connected_event = threading.Event()
 
     def _handle_connect(
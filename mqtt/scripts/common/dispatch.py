@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, NamedTuple, Optional
+
+import paho.mqtt.client as mqtt
+
+POLICIES = ("block", "drop-oldest", "drop-newest")
+POOLS = ("thread", "process")
+LATENCY_SAMPLES = 1000
+
+_STOP = object()
+
+
+class Message(NamedTuple):
+    topic: str
+    payload: bytes
+    qos: int
+    retain: bool
+    mid: int
+    received_at: float
+
+
+class _Shard:
+    def __init__(self, queue_size: int) -> None:
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.max_depth = 0
+        self.thread: Optional[threading.Thread] = None
+
+
+def _percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        handler: Callable[[List[Message]], None],
+        workers: int = 4,
+        pool: str = "thread",
+        queue_size: int = 1000,
+        policy: str = "block",
+        batch_size: int = 1,
+        batch_timeout: float = 0.05,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"invalid backpressure policy: {policy}")
+        if pool not in POOLS:
+            raise ValueError(f"invalid pool: {pool}")
+        self.handler = handler
+        self.policy = policy
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self._executor = ProcessPoolExecutor(max_workers=workers) if pool == "process" else None
+        self._shards = [_Shard(queue_size) for _ in range(workers)]
+        self._lock = threading.Lock()
+        self.received = 0
+        self.handled = 0
+        self.dropped = 0
+        self.failed = 0
+        self._handler_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._queue_latencies = deque(maxlen=LATENCY_SAMPLES)
+        for index, shard in enumerate(self._shards):
+            shard.thread = threading.Thread(target=self._run, args=(shard,), name=f"dispatch-{index}", daemon=True)
+            shard.thread.start()
+
+    # one worker per shard keeps messages of a topic in arrival order
+    def _shard(self, topic: str) -> _Shard:
+        return self._shards[zlib.crc32(topic.encode("utf-8")) % len(self._shards)]
+
+    def submit(self, message: Message) -> None:
+        shard = self._shard(message.topic)
+        with self._lock:
+            self.received += 1
+        if self.policy == "block":
+            shard.queue.put(message)
+        else:
+            while True:
+                try:
+                    shard.queue.put_nowait(message)
+                    break
+                except queue.Full:
+                    if self.policy == "drop-newest":
+                        with self._lock:
+                            self.dropped += 1
+                        return
+                try:
+                    shard.queue.get_nowait()
+                    with self._lock:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass
+        shard.max_depth = max(shard.max_depth, shard.queue.qsize())
+
+    def on_message(self, _client: mqtt.Client, _userdata, message: mqtt.MQTTMessage) -> None:
+        self.submit(
+            Message(message.topic, message.payload, message.qos, message.retain, message.mid, time.monotonic())
+        )
+
+    def _next_batch(self, shard: _Shard) -> Optional[List[Message]]:
+        first = shard.queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_timeout
+        while len(batch) < self.batch_size:
+            try:
+                item = shard.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                shard.queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self, shard: _Shard) -> None:
+        while True:
+            batch = self._next_batch(shard)
+            if batch is None:
+                return
+            started = time.monotonic()
+            try:
+                if self._executor is not None:
+                    self._executor.submit(self.handler, batch).result()
+                else:
+                    self.handler(batch)
+            except Exception as exc:
+                print(f"handler failed: {exc}")
+                with self._lock:
+                    self.failed += len(batch)
+            finished = time.monotonic()
+            with self._lock:
+                self.handled += len(batch)
+                self._handler_latencies.append(finished - started)
+                self._queue_latencies.extend(started - message.received_at for message in batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            handler_latencies = list(self._handler_latencies)
+            queue_latencies = list(self._queue_latencies)
+            stats = {
+                "received": self.received,
+                "handled": self.handled,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+        stats["depth"] = [shard.queue.qsize() for shard in self._shards]
+        stats["max_depth"] = [shard.max_depth for shard in self._shards]
+        stats["handler_p50_ms"] = _percentile(handler_latencies, 0.50) * 1000
+        stats["handler_p95_ms"] = _percentile(handler_latencies, 0.95) * 1000
+        stats["queue_p95_ms"] = _percentile(queue_latencies, 0.95) * 1000
+        return stats
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        for shard in self._shards:
+            shard.queue.put(_STOP)
+        for shard in self._shards:
+            shard.thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown()
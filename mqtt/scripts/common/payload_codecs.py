@@ -0,0 +1,235 @@
+import json
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, NamedTuple, Optional, Tuple, Union
+
+from common.common import encode_payload
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+IR_VERSION = 1
+
+_HEADER = struct.Struct("!BB")
+_U8 = struct.Struct("!B")
+_U16 = struct.Struct("!H")
+_U32 = struct.Struct("!I")
+_I16 = struct.Struct("!h")
+
+_HAS_PROTOCOL = 0x01
+_HAS_SIGNAL = 0x02
+_SENT_AT_EPOCH = 0x04
+_SENT_AT_TEXT = 0x08
+_HAS_EXTRA = 0x10
+_SENT_AT_OFFSET = 0x20
+
+_EPOCH = datetime(1970, 1, 1)
+_HEX = [f"0x{value:02x}" for value in range(256)]
+_HEX_VALUES = {text: value for value, text in enumerate(_HEX)}
+
+
+class Codec(NamedTuple):
+    name: str
+    encode: Callable[[dict], bytes]
+    decode: Callable[[Buffer], dict]
+
+
+_codecs: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    _codecs[codec.name] = codec
+
+
+def get_codec(name: str) -> Codec:
+    try:
+        return _codecs[name]
+    except KeyError:
+        raise ValueError(f"unknown codec: {name} (available: {', '.join(sorted(_codecs))})") from None
+
+
+def available_codecs() -> list:
+    return sorted(_codecs)
+
+
+# clients speak MQTT 3.1.1, which has no content-type property, so the topic suffix names the codec
+def codec_for(topic: Optional[str] = None, default: str = "json") -> Codec:
+    if topic:
+        codec = _codecs.get(topic.rsplit("/", 1)[-1])
+        if codec is not None:
+            return codec
+    return get_codec(default)
+
+
+def codec_topic(topic: str, name: str) -> str:
+    return topic if name == "json" else f"{topic}/{name}"
+
+
+def decode_message(topic: str, payload: Buffer) -> dict:
+    try:
+        return codec_for(topic).decode(payload)
+    except struct.error as exc:
+        raise ValueError(f"truncated payload: {exc}") from None
+
+
+def _json_encode(payload: dict) -> bytes:
+    return encode_payload(payload).encode("ascii")
+
+
+def _json_decode(data: Buffer) -> dict:
+    # str() decodes any buffer in place; json.loads rejects memoryview and would decode bytes the same way
+    return json.loads(str(data, "utf-8"))
+
+
+register_codec(Codec("json", _json_encode, _json_decode))
+
+
+def _signal_bytes(signal_state) -> Optional[bytes]:
+    # only canonical "0x%02x" strings are packed so decoding gives back the exact input
+    if not isinstance(signal_state, list) or len(signal_state) > 0xFFFF:
+        return None
+    try:
+        return bytes(map(_HEX_VALUES.__getitem__, signal_state))
+    except (KeyError, TypeError):
+        return None
+
+
+def _format_sent_at(epoch: int, offset: Optional[int]) -> str:
+    if offset is None:
+        return (_EPOCH + timedelta(seconds=epoch)).isoformat()
+    return datetime.fromtimestamp(epoch, timezone(timedelta(minutes=offset))).isoformat()
+
+
+def _sent_at_epoch(sent_at) -> Optional[Tuple[int, Optional[int]]]:
+    # same round-trip rule: only second-precision ISO timestamps, naive or with a whole-minute
+    # offset, become an epoch; anything whose re-formatting differs from the input stays text
+    if not isinstance(sent_at, str) or len(sent_at) not in (19, 25):
+        return None
+    try:
+        moment = datetime.fromisoformat(sent_at)
+    except ValueError:
+        return None
+    offset = None
+    if moment.tzinfo is None:
+        epoch = (moment - _EPOCH) // timedelta(seconds=1)
+    else:
+        offset = moment.utcoffset() // timedelta(minutes=1)
+        epoch = (moment - _EPOCH.replace(tzinfo=timezone.utc)) // timedelta(seconds=1)
+    if not 0 <= epoch < 2 ** 32 or _format_sent_at(epoch, offset) != sent_at:
+        return None
+    return epoch, offset
+
+
+def _ir_encode(payload: dict) -> bytes:
+    flags = 0
+    parts = []
+    # None values travel in the JSON tail so they come back as explicit nulls, as with the json codec
+    extra = {
+        key: value
+        for key, value in payload.items()
+        if key not in ("protocol", "signalState", "sentAt") or value is None
+    }
+    protocol = payload.get("protocol")
+    if protocol is not None:
+        encoded = protocol.encode("utf-8") if isinstance(protocol, str) else None
+        if encoded is None or len(encoded) > 0xFF:
+            extra["protocol"] = protocol
+        else:
+            flags |= _HAS_PROTOCOL
+            parts += [_U8.pack(len(encoded)), encoded]
+    signal_state = payload.get("signalState")
+    if signal_state is not None:
+        raw = _signal_bytes(signal_state)
+        if raw is None:
+            extra["signalState"] = signal_state
+        else:
+            flags |= _HAS_SIGNAL
+            parts += [_U16.pack(len(raw)), raw]
+    sent_at = payload.get("sentAt")
+    if sent_at is not None:
+        packed = _sent_at_epoch(sent_at)
+        if packed is not None:
+            epoch, offset = packed
+            flags |= _SENT_AT_EPOCH
+            parts.append(_U32.pack(epoch))
+            if offset is not None:
+                flags |= _SENT_AT_OFFSET
+                parts.append(_I16.pack(offset))
+        elif isinstance(sent_at, str) and len(sent_at.encode("utf-8")) <= 0xFF:
+            encoded = sent_at.encode("utf-8")
+            flags |= _SENT_AT_TEXT
+            parts += [_U8.pack(len(encoded)), encoded]
+        else:
+            extra["sentAt"] = sent_at
+    if extra:
+        flags |= _HAS_EXTRA
+        parts.append(_json_encode(extra))
+    return _HEADER.pack(IR_VERSION, flags) + b"".join(parts)
+
+
+def _take(view: memoryview, offset: int, length: int) -> memoryview:
+    if offset + length > len(view):
+        raise ValueError(f"truncated ir payload: field needs {length} bytes at offset {offset}, have {len(view) - offset}")
+    return view[offset:offset + length]
+
+
+def _ir_decode(data: Buffer) -> dict:
+    view = memoryview(data)
+    version, flags = _HEADER.unpack_from(view, 0)
+    if version != IR_VERSION:
+        raise ValueError(f"unsupported ir codec version: {version}")
+    offset = _HEADER.size
+    payload = {}
+    if flags & _HAS_PROTOCOL:
+        (length,) = _U8.unpack_from(view, offset)
+        offset += _U8.size
+        payload["protocol"] = str(_take(view, offset, length), "utf-8")
+        offset += length
+    if flags & _HAS_SIGNAL:
+        (length,) = _U16.unpack_from(view, offset)
+        offset += _U16.size
+        payload["signalState"] = list(map(_HEX.__getitem__, _take(view, offset, length)))
+        offset += length
+    if flags & _SENT_AT_EPOCH:
+        (epoch,) = _U32.unpack_from(view, offset)
+        offset += _U32.size
+        minutes = None
+        if flags & _SENT_AT_OFFSET:
+            (minutes,) = _I16.unpack_from(view, offset)
+            offset += _I16.size
+        payload["sentAt"] = _format_sent_at(epoch, minutes)
+    elif flags & _SENT_AT_TEXT:
+        (length,) = _U8.unpack_from(view, offset)
+        offset += _U8.size
+        payload["sentAt"] = str(_take(view, offset, length), "utf-8")
+        offset += length
+    if flags & _HAS_EXTRA:
+        extra = _json_decode(view[offset:])
+        if not isinstance(extra, dict):
+            raise ValueError(f"invalid ir payload: extra fields must be an object, got {type(extra).__name__}")
+        payload.update(extra)
+    return payload
+
+
+register_codec(Codec("ir", _ir_encode, _ir_decode))
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+if msgpack is not None:
+    register_codec(
+        Codec(
+            "msgpack",
+            lambda payload: msgpack.packb(payload, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False),
+        )
+    )
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+if cbor2 is not None:
+    register_codec(Codec("cbor", cbor2.dumps, cbor2.loads))
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import random
+import resource
+import time
+
+from common.aio import AsyncClient
+from common.common import TOPIC, encode_payload
+from publisher import sample_payload
+
+
+def _raise_fd_limit(needed: int) -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+class Counters:
+    def __init__(self) -> None:
+        self.connected = 0
+        self.published = 0
+        self.received = 0
+        self.failed = 0
+
+
+async def _device(index: int, args, counters: Counters, start: asyncio.Semaphore, stop: asyncio.Event) -> None:
+    async with start:
+        client = AsyncClient(f"device-{index}")
+        await client.connect()
+        try:
+            await client.wait_for_connection(args.connect_timeout)
+        except TimeoutError:
+            counters.failed += 1
+            await client.disconnect()
+            return
+    counters.connected += 1
+    topic = f"{args.topic}/{index}"
+    try:
+        await asyncio.sleep(random.uniform(0, args.interval))
+        while not stop.is_set():
+            await client.publish(topic, encode_payload(sample_payload()), qos=args.qos)
+            counters.published += 1
+            try:
+                await asyncio.wait_for(stop.wait(), args.interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        counters.connected -= 1
+        await client.disconnect()
+
+
+async def _monitor(args, counters: Counters) -> None:
+    async with AsyncClient("device-monitor") as client:
+        client.subscribe(f"{args.topic}/#", qos=0)
+        async for _message in client.messages():
+            counters.received += 1
+
+
+async def _report(counters: Counters, interval: float) -> None:
+    last_published = 0
+    last_received = 0
+    last = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        elapsed = now - last
+        print(
+            f"devices={counters.connected} failed={counters.failed} "
+            f"publish={(counters.published - last_published) / elapsed:.0f} msg/s "
+            f"receive={(counters.received - last_received) / elapsed:.0f} msg/s"
+        )
+        last_published = counters.published
+        last_received = counters.received
+        last = now
+
+
+async def run(args) -> None:
+    counters = Counters()
+    stop = asyncio.Event()
+    start = asyncio.Semaphore(args.connect_concurrency)
+    tasks = [asyncio.create_task(_device(index, args, counters, start, stop)) for index in range(args.devices)]
+    helpers = [asyncio.create_task(_report(counters, args.report_interval))]
+    if args.monitor:
+        helpers.append(asyncio.create_task(_monitor(args, counters)))
+    try:
+        if args.duration > 0:
+            await asyncio.sleep(args.duration)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for helper in helpers:
+            helper.cancel()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between publishes per device")
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=0)
+    parser.add_argument("--topic", default=f"{TOPIC}/devices")
+    parser.add_argument("--duration", type=float, default=0.0, help="seconds to run (0 until interrupted)")
+    parser.add_argument("--connect-concurrency", type=int, default=100, help="connections opened at once")
+    parser.add_argument("--connect-timeout", type=float, default=30.0)
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--monitor", action="store_true", help="also count messages with one subscriber")
+    args = parser.parse_args()
+
+    _raise_fd_limit(args.devices + 256)
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
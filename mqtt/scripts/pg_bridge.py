@@ -0,0 +1,303 @@
+import argparse
+import base64
+import csv
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+import psycopg2
+from psycopg2.extensions import make_dsn
+
+from common.common import TOPIC, build_client, connect_with_retry
+from common.payload_codecs import decode_message
+
+TABLE = os.getenv("BRIDGE_TABLE", "signal_states")
+COLUMNS = ["topic", "protocol", "signal_state", "sent_at", "received_at", "payload"]
+REPORT_INTERVAL = 5.0
+
+
+def _dsn() -> str:
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url.replace("postgresql+psycopg2://", "postgresql://", 1)
+    return make_dsn(
+        host=os.getenv("POSTGRES_HOST", "localhost"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        password=os.getenv("POSTGRES_PASSWORD", ""),
+        dbname=os.getenv("POSTGRES_DB", "postgres"),
+    )
+
+
+def _parse_sent_at(value) -> Optional[datetime]:
+    if not isinstance(value, str):
+        return None
+    # publishers send an offset; a naive value is read in the database session's time zone
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class Bridge:
+    def __init__(
+        self,
+        client: mqtt.Client,
+        batch_size: int,
+        flush_interval: float,
+        dead_letter: Optional[str] = None,
+    ) -> None:
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dead_letter = dead_letter
+        self._dead_letter_lock = threading.Lock()
+        self._buffer: List[Tuple[tuple, int, int, float]] = []
+        self._oldest: Optional[float] = None
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._conn = None
+        self.rows = 0
+        self.invalid = 0
+        self.rejected = 0
+        self.error: Optional[BaseException] = None
+        self._lags = []
+        self._thread = threading.Thread(target=self._run, name="pg-bridge-flush", daemon=True)
+
+    def start(self) -> None:
+        self._connect()
+        with self._conn.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{TABLE}" ('
+                '"id" bigserial PRIMARY KEY, "topic" text NOT NULL, "protocol" text, '
+                '"signal_state" jsonb, "sent_at" timestamptz, "received_at" timestamptz NOT NULL, '
+                '"payload" jsonb NOT NULL)'
+            )
+            # tables from before the timestamptz switch held UTC received_at and publisher-local sent_at
+            cursor.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = %s "
+                "AND column_name IN ('sent_at', 'received_at') AND data_type = 'timestamp without time zone'",
+                (TABLE,),
+            )
+            naive = {row[0] for row in cursor.fetchall()}
+            if "received_at" in naive:
+                cursor.execute(
+                    f'ALTER TABLE "{TABLE}" ALTER COLUMN "received_at" TYPE timestamptz '
+                    "USING \"received_at\" AT TIME ZONE 'UTC'"
+                )
+            if "sent_at" in naive:
+                cursor.execute(f'ALTER TABLE "{TABLE}" ALTER COLUMN "sent_at" TYPE timestamptz')
+        self._conn.commit()
+        self._thread.start()
+
+    def _connect(self) -> None:
+        while True:
+            try:
+                self._conn = psycopg2.connect(_dsn())
+                return
+            except psycopg2.OperationalError as exc:
+                print(f"postgres connect failed: {exc}; retrying...")
+                time.sleep(1)
+
+    def _dead_letter(self, record: dict) -> None:
+        if self.dead_letter is None:
+            return
+        # written from both the network thread and the flush thread
+        with self._dead_letter_lock, open(self.dead_letter, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def _row(self, message: mqtt.MQTTMessage, received: float) -> tuple:
+        payload = decode_message(message.topic, message.payload)
+        if not isinstance(payload, dict):
+            raise ValueError(f"expected an object, got {type(payload).__name__}")
+        return (
+            message.topic,
+            payload.get("protocol"),
+            json.dumps(payload.get("signalState")),
+            _parse_sent_at(payload.get("sentAt")),
+            datetime.fromtimestamp(received, timezone.utc),
+            json.dumps(payload),
+        )
+
+    def on_message(self, client: mqtt.Client, _userdata, message: mqtt.MQTTMessage) -> None:
+        received = time.time()
+        try:
+            row = self._row(message, received)
+        except Exception as exc:
+            # anything raised here would escape into paho and stop the network thread
+            print(f"invalid payload topic={message.topic}: {exc}")
+            self.invalid += 1
+            self._dead_letter({
+                "topic": message.topic,
+                "payload_b64": base64.b64encode(message.payload).decode("ascii"),
+                "error": str(exc),
+            })
+            client.ack(message.mid, message.qos)
+            return
+        with self._cond:
+            self._buffer.append((row, message.mid, message.qos, received))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def _copy(self, rows: list) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["" if value is None else value for value in row])
+        buffer.seek(0)
+        columns = ", ".join(f'"{name}"' for name in COLUMNS)
+        with self._conn.cursor() as cursor:
+            cursor.copy_expert(f'COPY "{TABLE}" ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        self._conn.commit()
+
+    def _take_batch(self) -> list:
+        with self._cond:
+            while not self._stopping:
+                if len(self._buffer) >= self.batch_size:
+                    break
+                if self._oldest is not None:
+                    remaining = self.flush_interval - (time.monotonic() - self._oldest)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:self.batch_size]
+            self._oldest = time.monotonic() if self._buffer else None
+            return batch
+
+    def _copy_with_retry(self, batch: list) -> None:
+        while True:
+            try:
+                self._copy([row for row, _, _, _ in batch])
+                return
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as exc:
+                print(f"flush failed: {exc}; retrying...")
+                try:
+                    self._conn.rollback()
+                except psycopg2.Error:
+                    self._connect()
+                time.sleep(1)
+
+    def _reject(self, entry: tuple, exc: psycopg2.Error) -> None:
+        row = entry[0]
+        print(f"rejected row topic={row[0]}: {str(exc).strip()}")
+        self._dead_letter({"topic": row[0], "payload": row[5], "error": str(exc).strip()})
+        self.rejected += 1
+
+    def _flush(self, batch: list) -> None:
+        # a row the table rejects is isolated by bisecting the batch, so it cannot block the rest
+        parts = [batch]
+        while parts:
+            part = parts.pop(0)
+            try:
+                self._copy_with_retry(part)
+            except (psycopg2.DataError, psycopg2.IntegrityError) as exc:
+                self._conn.rollback()
+                if len(part) == 1:
+                    self._reject(part[0], exc)
+                    _, mid, qos, _ = part[0]
+                    self.client.ack(mid, qos)
+                else:
+                    middle = len(part) // 2
+                    parts[:0] = [part[:middle], part[middle:]]
+                continue
+            committed = time.time()
+            # QoS 1 acks go out only after the rows are durable, in the order the messages arrived
+            for _, mid, qos, _ in part:
+                self.client.ack(mid, qos)
+            with self._cond:
+                self.rows += len(part)
+                self._lags.extend(committed - received for _, _, _, received in part)
+
+    def _run(self) -> None:
+        try:
+            while True:
+                batch = self._take_batch()
+                if batch:
+                    self._flush(batch)
+                elif self._stopping:
+                    return
+        except Exception as exc:
+            print(f"flush stopped: {exc}")
+            self.error = exc
+
+    def report(self, elapsed: float) -> None:
+        with self._cond:
+            rows, self.rows = self.rows, 0
+            lags, self._lags = self._lags, []
+            buffered = len(self._buffer)
+        rate = rows / elapsed if elapsed > 0 else 0.0
+        print(
+            f"bridge: rows={rows} rate={rate:.0f} rows/s buffered={buffered} invalid={self.invalid} "
+            f"rejected={self.rejected} "
+            f"lag_p50={_percentile(lags, 0.50) * 1000:.1f}ms lag_p95={_percentile(lags, 0.95) * 1000:.1f}ms"
+        )
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+        self._conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--topic", default=TOPIC)
+    parser.add_argument("--qos", type=int, choices=(0, 1), default=1)
+    parser.add_argument("--batch-size", type=int, default=500, help="flush when this many rows are buffered")
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="flush buffered rows older than this")
+    parser.add_argument("--dead-letter", help="append undecodable messages and rejected rows to this JSONL file")
+    args = parser.parse_args()
+
+    def handle_connect(client: mqtt.Client, _userdata, _flags, rc: int) -> None:
+        if rc != 0:
+            return
+        client.subscribe([(args.topic, args.qos), (f"{args.topic}/+", args.qos)])
+        print(f"subscribed to {args.topic}")
+
+    client = build_client("pg-bridge", on_connect=handle_connect, clean_session=False, manual_ack=True)
+    bridge = Bridge(client, args.batch_size, args.flush_interval, args.dead_letter)
+    bridge.start()
+    client.on_message = bridge.on_message
+
+    connect_with_retry(client)
+    # our own thread instead of loop_start() so a network loop that died on an exception is noticed
+    network = threading.Thread(target=client.loop_forever, name="pg-bridge-mqtt", daemon=True)
+    network.start()
+    started = time.monotonic()
+    try:
+        while bridge.error is None:
+            time.sleep(REPORT_INTERVAL)
+            if not network.is_alive():
+                print("mqtt network loop stopped")
+                break
+            now = time.monotonic()
+            bridge.report(now - started)
+            started = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bridge.stop()
+        client.disconnect()
+        network.join(REPORT_INTERVAL)
+
+
+if __name__ == "__main__":
+    main()
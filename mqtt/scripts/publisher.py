@@ -1,6 +1,12 @@
+import argparse
 import json
 import sys
+import threading
 import time
+from datetime import datetime
+from typing import Iterator, Optional
+
+import paho.mqtt.client as mqtt
 
 from common.common import (
     TOPIC,
@@ -9,27 +15,225 @@ from common.common import (
     encode_payload,
     wait_for_connection,
 )
+from common.payload_codecs import available_codecs, codec_topic, get_codec
+
+REPORT_INTERVAL = 5.0
+
+
+def sample_payload() -> dict:
+    return {
+        "protocol": "Panasonic_AC",
+        "signalState": ["0x23", "0x35"],
+        "sentAt": datetime.now().astimezone().isoformat(timespec="seconds"),
+    }
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate / 10)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            time.sleep((1 - self._tokens) / self.rate)
+
+
+class InflightTracker:
+    def __init__(self, max_inflight: int) -> None:
+        self._slots = threading.Semaphore(max_inflight)
+        self._max_inflight = max_inflight
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._early_acks = {}
+        self.latencies = []
+        self.acked = 0
+
+    def acquire(self) -> None:
+        self._slots.acquire()
+
+    def _ack(self, sent_at: float, acked_at: float) -> None:
+        self.latencies.append(acked_at - sent_at)
+        self.acked += 1
+        self._slots.release()
+
+    def discard(self) -> None:
+        self._slots.release()
+
+    def sent(self, mid: int, sent_at: float) -> None:
+        # on_publish may fire before publish() returns the mid, so either side can finish the pair
+        with self._lock:
+            acked_at = self._early_acks.pop(mid, None)
+            if acked_at is None:
+                self._pending[mid] = sent_at
+            else:
+                self._ack(sent_at, acked_at)
+
+    def on_publish(self, _client: mqtt.Client, _userdata, mid: int) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            sent_at = self._pending.pop(mid, None)
+            if sent_at is None:
+                self._early_acks[mid] = now
+            else:
+                self._ack(sent_at, now)
+
+    def drain(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        for taken in range(self._max_inflight):
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                for _ in range(taken):
+                    self._slots.release()
+                return False
+        for _ in range(self._max_inflight):
+            self._slots.release()
+        return True
+
+    def take_latencies(self) -> list:
+        with self._lock:
+            latencies, self.latencies = self.latencies, []
+        return latencies
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _report(label: str, count: int, elapsed: float, latencies: list) -> None:
+    rate = count / elapsed if elapsed > 0 else 0.0
+    if latencies:
+        print(
+            f"{label}: sent={count} rate={rate:.0f} msg/s "
+            f"ack_p50={_percentile(latencies, 0.50) * 1000:.2f}ms "
+            f"ack_p95={_percentile(latencies, 0.95) * 1000:.2f}ms "
+            f"ack_max={max(latencies) * 1000:.2f}ms"
+        )
+    else:
+        print(f"{label}: sent={count} rate={rate:.0f} msg/s")
+
+
+def read_payloads(path: str) -> Iterator[dict]:
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def generate_payloads(count: int) -> Iterator[dict]:
+    sent = 0
+    while count <= 0 or sent < count:
+        yield sample_payload()
+        sent += 1
+
+
+def stream(
+    payloads: Iterator[dict],
+    topic: str = TOPIC,
+    qos: int = 1,
+    rate: float = 0.0,
+    max_inflight: int = 100,
+    drain_timeout: float = 30.0,
+    codec: str = "json",
+) -> int:
+    encode = encode_payload if codec == "json" else get_codec(codec).encode
+    topic = codec_topic(topic, codec)
+    client = build_client("publisher")
+    client.max_inflight_messages_set(max_inflight)
+    tracker = InflightTracker(max_inflight)
+    client.on_publish = tracker.on_publish
+    connect_with_retry(client)
+    client.loop_start()
+    wait_for_connection(client)
+
+    bucket = TokenBucket(rate)
+    sent = 0
+    window_sent = 0
+    started = time.perf_counter()
+    window_started = started
+    try:
+        for payload in payloads:
+            message = encode(payload)
+            bucket.acquire()
+            tracker.acquire()
+            sent_at = time.perf_counter()
+            info = client.publish(topic, message, qos=qos)
+            if qos == 0 and info.rc != mqtt.MQTT_ERR_SUCCESS:
+                # paho drops QoS 0 messages while disconnected and never calls on_publish
+                tracker.discard()
+                continue
+            tracker.sent(info.mid, sent_at)
+            sent += 1
+            window_sent += 1
+            if sent_at - window_started >= REPORT_INTERVAL:
+                _report("publishing", window_sent, sent_at - window_started, tracker.take_latencies())
+                window_sent = 0
+                window_started = sent_at
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if not tracker.drain(drain_timeout):
+            print("timed out waiting for acks")
+        elapsed = time.perf_counter() - started
+        _report("published", sent, elapsed, tracker.take_latencies())
+        client.loop_stop()
+        client.disconnect()
+    return sent
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("payload", nargs="*", help="JSON payload for a single message")
+    parser.add_argument("--file", help="stream JSONL payloads from a file, '-' for stdin")
+    parser.add_argument("--generate", type=int, metavar="COUNT", help="stream COUNT sample payloads (0 for endless)")
+    parser.add_argument("--topic", default=TOPIC)
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--rate", type=float, default=0.0, help="messages per second (0 for unlimited)")
+    parser.add_argument("--max-inflight", type=int, default=100)
+    parser.add_argument("--codec", choices=available_codecs(), default="json", help="payload encoding (topic suffix)")
+    args = parser.parse_args()
+
+    if args.file is not None:
+        stream(read_payloads(args.file), args.topic, args.qos, args.rate, args.max_inflight, codec=args.codec)
+        return
+    if args.generate is not None:
+        stream(generate_payloads(args.generate), args.topic, args.qos, args.rate, args.max_inflight, codec=args.codec)
+        return
+
     client = build_client("publisher")
     connect_with_retry(client)
     client.loop_start()
     wait_for_connection(client)
 
-    if sys.argv[1:]:
-        raw = " ".join(sys.argv[1:])
+    if args.payload:
+        raw = " ".join(args.payload)
         payload = json.loads(raw)
     else:
-        payload = {
-            "protocol": "Panasonic_AC",
-            "signalState": ["0x23", "0x35"],
-            "sentAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
-        }
-    message = encode_payload(payload)
-    info = client.publish(TOPIC, message)
+        payload = sample_payload()
+    topic = codec_topic(args.topic, args.codec)
+    if args.codec == "json":
+        message = encode_payload(payload)
+        shown = message
+    else:
+        message = get_codec(args.codec).encode(payload)
+        shown = f"<{args.codec} {len(message)} bytes>"
+    info = client.publish(topic, message)
     info.wait_for_publish()
-    print(f"sent topic={TOPIC} payload={message}")
+    print(f"sent topic={topic} payload={shown}")
 
     client.loop_stop()
     client.disconnect()
@@ -1,28 +1,74 @@
+import argparse
+import threading
+from typing import List
+
 import paho.mqtt.client as mqtt
 
-from common.common import TOPIC, build_client, connect_with_retry, decode_payload
+from common.common import TOPIC, build_client, connect_with_retry
+from common.dispatch import POLICIES, POOLS, Dispatcher, Message
+from common.payload_codecs import decode_message
 
 
-def on_message(_client: mqtt.Client, _userdata, message: mqtt.MQTTMessage) -> None:
-    payload = decode_payload(message.payload)
-    protocol = payload.get("protocol")
-    signal_state = payload.get("signalState")
-    print(f"recv topic={message.topic} protocol={protocol} signalState={signal_state}")
+def print_messages(messages: List[Message]) -> None:
+    for message in messages:
+        payload = decode_message(message.topic, message.payload)
+        protocol = payload.get("protocol")
+        signal_state = payload.get("signalState")
+        print(f"recv topic={message.topic} protocol={protocol} signalState={signal_state}")
 
 
 def handle_connect(client: mqtt.Client, _userdata, _flags, rc: int) -> None:
     if rc != 0:
         return
-    client.subscribe(TOPIC)
+    client.subscribe([(TOPIC, 0), (f"{TOPIC}/+", 0)])
     print(f"subscribed to {TOPIC}")
 
 
+def _report_stats(dispatcher: Dispatcher, interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        stats = dispatcher.stats()
+        print(
+            f"stats: received={stats['received']} handled={stats['handled']} "
+            f"dropped={stats['dropped']} failed={stats['failed']} "
+            f"depth={sum(stats['depth'])} max_depth={max(stats['max_depth'])} "
+            f"handler_p95={stats['handler_p95_ms']:.2f}ms queue_p95={stats['queue_p95_ms']:.2f}ms"
+        )
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pool", choices=POOLS, default="thread")
+    parser.add_argument("--queue-size", type=int, default=1000, help="per-worker queue bound")
+    parser.add_argument("--policy", choices=POLICIES, default="block", help="what to do when a queue is full")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--stats-interval", type=float, default=0.0, help="seconds between stats lines (0 to disable)")
+    args = parser.parse_args()
+
+    dispatcher = Dispatcher(
+        print_messages,
+        workers=args.workers,
+        pool=args.pool,
+        queue_size=args.queue_size,
+        policy=args.policy,
+        batch_size=args.batch_size,
+    )
+    stop = threading.Event()
+    if args.stats_interval > 0:
+        threading.Thread(target=_report_stats, args=(dispatcher, args.stats_interval, stop), daemon=True).start()
+
     client = build_client("subscriber", on_connect=handle_connect)
-    client.on_message = on_message
+    client.on_message = dispatcher.on_message
 
     connect_with_retry(client)
-    client.loop_forever()
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        client.disconnect()
+        dispatcher.close()
 
 
 if __name__ == "__main__":